@@ -0,0 +1,197 @@
+"""
+Batch solving of many Fifteen puzzle boards across processes
+
+Command line use reads one board per line from stdin (or a file) as a
+JSON list of rows and writes one JSON object per line with the input
+index, the board and its move string, or an "error" message instead of
+the moves for a board that is invalid or unsolvable (and instead of
+the board for a line that is not valid JSON):
+
+    python batch.py --workers 8 --mode fast < boards.jsonl > moves.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from move_optimizer import optimize_moves
+from solver import Puzzle
+
+MODES = ("fast", "compact", "optimal")
+
+
+def solve_grid(grid, mode="fast"):
+    """
+    Solve a single board given as a list of rows
+    Returns a move string
+    """
+    puzzle = Puzzle(len(grid), len(grid[0]), grid)
+    if mode == "fast":
+        return puzzle.solve_puzzle()
+    if mode == "compact":
+        zero_row, zero_col = puzzle.current_position(0, 0)
+        return optimize_moves(puzzle.solve_puzzle(), puzzle.get_height(),
+                              puzzle.get_width(), zero_row, zero_col)
+    if mode == "optimal":
+        return puzzle.solve_optimal()
+    raise ValueError("unknown mode: " + str(mode))
+
+
+def _solve_chunk(chunk):
+    """
+    Pool entry point for a list of (index, grid, mode) jobs
+    Returns a list of (index, moves or None, error message or None)
+    """
+    results = []
+    for index, grid, mode in chunk:
+        try:
+            results.append((index, solve_grid(grid, mode), None))
+        except Exception as error:
+            # One bad board must not lose the rest of its chunk
+            results.append((index, None, str(error)))
+    return results
+
+
+def _chunked(jobs, chunksize):
+    """
+    Group an iterable of jobs into lists of at most chunksize
+    Yields lists
+    """
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_solve_many(grids, workers=None, mode="fast", chunksize=64):
+    """
+    Solve boards from any iterable, spreading chunks of them over a
+    process pool (workers=1 solves in this process). Only a few chunks
+    per worker are in flight, so unbounded input streams are fine
+    Yields (index, moves, error) tuples in input order, where moves is
+    None and error a message for boards that could not be solved
+    """
+    if mode not in MODES:
+        raise ValueError("unknown mode: " + str(mode))
+    jobs = ((index, grid, mode) for index, grid in enumerate(grids))
+    if workers == 1:
+        for chunk in _chunked(jobs, chunksize):
+            for result in _solve_chunk(chunk):
+                yield result
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = 2 * workers
+        pending = deque()
+        for chunk in _chunked(jobs, chunksize):
+            pending.append(executor.submit(_solve_chunk, chunk))
+            if len(pending) >= window:
+                for result in pending.popleft().result():
+                    yield result
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+
+def solve_many(grids, workers=None, mode="fast", chunksize=64):
+    """
+    Solve a collection of boards across a process pool
+    Raises ValueError naming the first board that could not be solved;
+    iter_solve_many reports every failed board instead
+    Returns a list of move strings in the same order as grids
+    """
+    solutions = []
+    for index, moves, error in iter_solve_many(grids, workers, mode,
+                                               chunksize):
+        if error is not None:
+            raise ValueError("board %d: %s" % (index, error))
+        solutions.append(moves)
+    return solutions
+
+
+def _read_grids(stream, errors):
+    """
+    Parse one JSON board per non-empty line; a line that is not valid
+    JSON yields None and leaves its message in errors under its index
+    Yields lists of rows
+    """
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                errors[index] = "line is not valid JSON: " + str(error)
+                yield None
+            index += 1
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Solve Fifteen puzzle boards given as JSON lines")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file with one JSON board per line (default stdin)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("-m", "--mode", choices=MODES, default="fast")
+    parser.add_argument("-c", "--chunksize", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.input == "-" else open(args.input)
+    grids = {}
+    unparsable = {}
+
+    def remember(source):
+        for index, grid in enumerate(source):
+            grids[index] = grid
+            yield grid
+
+    start = time.time()
+    count = 0
+    failed = 0
+    try:
+        for index, moves, error in iter_solve_many(
+                remember(_read_grids(stream, unparsable)), args.workers,
+                args.mode, args.chunksize):
+            result = {"index": index}
+            grid = grids.pop(index)
+            if index in unparsable:
+                error = unparsable.pop(index)
+            else:
+                result["grid"] = grid
+            if error is None:
+                result["moves"] = moves
+                count += 1
+            else:
+                result["error"] = error
+                failed += 1
+            sys.stdout.write(json.dumps(result) + "\n")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.time() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write("solved %d boards in %.2f s (%.1f boards/s)\n"
+                     % (count, elapsed, rate))
+    if failed:
+        sys.stderr.write("%d boards could not be solved\n" % failed)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
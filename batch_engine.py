@@ -0,0 +1,156 @@
+"""
+NumPy engine that moves and scores many Fifteen puzzle boards at once
+
+A BoardBatch holds N boards of the same shape as one (N, H*W) array
+plus a vector with the flat position of every blank. One call to
+apply() performs one blank move on every board; illegal moves are
+masked out and reported instead of raising, so a whole corpus of
+solutions can be replayed column by column. Requires numpy
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from generator import board_dtype
+
+# Move codes shared with optimal.py and move_codec.py: u, d, l, r
+DIRECTIONS = "udlr"
+CODES = {"u": 0, "d": 1, "l": 2, "r": 3}
+NO_MOVE = -1
+
+
+def encode_moves(move_strings):
+    """
+    Turn move strings into a padded (N, longest) array of move codes,
+    with NO_MOVE after the end of each string
+    Returns a numpy array
+    """
+    if numpy is None:
+        raise ImportError("the batch engine needs numpy")
+    longest = max([len(moves) for moves in move_strings] or [0])
+    codes = numpy.full((len(move_strings), longest), NO_MOVE, dtype=numpy.int8)
+    lookup = numpy.full(256, NO_MOVE, dtype=numpy.int8)
+    for direction, code in CODES.items():
+        lookup[ord(direction)] = code
+    for row, moves in enumerate(move_strings):
+        if moves:
+            raw = numpy.frombuffer(moves.encode("latin-1"), dtype=numpy.uint8)
+            coded = lookup[raw]
+            if (coded == NO_MOVE).any():
+                raise ValueError("invalid direction in move string %d" % row)
+            codes[row, :len(moves)] = coded
+    return codes
+
+
+class BoardBatch:
+    """
+    N boards of one shape stored as an (N, H*W) array
+    """
+
+    def __init__(self, boards, puzzle_height, puzzle_width):
+        """
+        Copy boards given as an (N, H, W) or (N, H*W) array-like
+        """
+        if numpy is None:
+            raise ImportError("the batch engine needs numpy")
+        self._height = puzzle_height
+        self._width = puzzle_width
+        size = puzzle_height * puzzle_width
+        self.cells = numpy.array(boards, dtype=board_dtype(size))
+        self.cells = self.cells.reshape(len(self.cells), size)
+        self.blank = numpy.argmin(self.cells, axis=1).astype(numpy.int64)
+        self._rows = numpy.arange(len(self.cells))
+        self._steps = numpy.array((-puzzle_width, puzzle_width, -1, 1, 0))
+        self._goal = numpy.arange(size)
+
+    def __len__(self):
+        """
+        Number of boards in the batch
+        Returns an integer
+        """
+        return len(self.cells)
+
+    def get_height(self):
+        """
+        Getter for board height
+        Returns an integer
+        """
+        return self._height
+
+    def get_width(self):
+        """
+        Getter for board width
+        Returns an integer
+        """
+        return self._width
+
+    def legal(self, codes):
+        """
+        Check one move code per board against the board edges
+        (NO_MOVE is always legal)
+        Returns a boolean (N,) array
+        """
+        codes = numpy.asarray(codes)
+        row = self.blank // self._width
+        col = self.blank % self._width
+        return ((codes == NO_MOVE) |
+                ((codes == 0) & (row > 0)) |
+                ((codes == 1) & (row < self._height - 1)) |
+                ((codes == 2) & (col > 0)) |
+                ((codes == 3) & (col < self._width - 1)))
+
+    def apply(self, codes):
+        """
+        Move the blank of every board by its move code in one step;
+        boards whose move would leave the grid are left untouched
+        Returns a boolean (N,) array, False where the move was illegal
+        """
+        codes = numpy.asarray(codes)
+        ok = self.legal(codes)
+        moving = self._rows[ok & (codes != NO_MOVE)]
+        blank = self.blank[moving]
+        target = blank + self._steps[codes[moving]]
+        self.cells[moving, blank] = self.cells[moving, target]
+        self.cells[moving, target] = 0
+        self.blank[moving] = target
+        return ok
+
+    def replay(self, move_strings):
+        """
+        Apply one move string per board, one vectorized step per move
+        A board stops at its first illegal move
+        Returns a boolean (N,) array, True where every move was legal
+        """
+        codes = encode_moves(move_strings)
+        valid = numpy.ones(len(self.cells), dtype=bool)
+        for step in range(codes.shape[1]):
+            column = numpy.where(valid, codes[:, step], NO_MOVE)
+            valid &= self.apply(column)
+        return valid
+
+    def manhattan(self):
+        """
+        Manhattan distance of every board, blank excluded
+        Returns an (N,) array
+        """
+        values = self.cells.astype(numpy.int64)
+        width = self._width
+        distance = (numpy.abs(values // width - self._goal // width) +
+                    numpy.abs(values % width - self._goal % width))
+        return numpy.where(values != 0, distance, 0).sum(axis=1)
+
+    def solved_counts(self):
+        """
+        Number of tiles (blank excluded) sitting on their solved cell
+        Returns an (N,) array
+        """
+        return ((self.cells == self._goal) & (self.cells != 0)).sum(axis=1)
+
+    def is_solved(self):
+        """
+        Which boards are in the solved configuration
+        Returns a boolean (N,) array
+        """
+        return (self.cells == self._goal).all(axis=1)
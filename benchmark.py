@@ -0,0 +1,225 @@
+"""
+Benchmark harness for the Fifteen puzzle solver
+
+Solves seeded, guaranteed solvable random boards over a matrix of
+board sizes and records solution length, wall time, peak memory,
+time spent in every phase method and current_position calls.
+Results are written as JSON so runs can be compared between commits:
+
+    python benchmark.py -o before.json
+    python benchmark.py -o after.json --baseline before.json --threshold 0.2
+
+With --baseline the exit status is 1 when any metric regressed by
+more than the threshold (a fraction of the baseline value)
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+import large_board
+from generator import parse_size, random_board
+from solver import VERIFY_MODES, Puzzle
+
+SIZES = ((3, 3), (4, 4), (8, 8), (16, 16), (32, 32), (3, 10))
+
+PHASE_METHODS = ("solve_interior_tile", "solve_col0_tile", "solve_row1_tile",
+                 "solve_row0_tile", "solve_2x2")
+
+# Timed repeats per board; the fastest one is the wall time, since
+# slower repeats only add scheduler and cache noise
+REPEATS = 5
+
+# Seconds one timed repeat should at least last, solving the board as
+# many times as needed, so sub-millisecond solves stay measurable
+MIN_REPEAT_TIME = 0.02
+
+# Metrics compared against a baseline; bigger is worse for all of them
+COMPARED = ("moves", "wall_time", "peak_memory", "current_position_calls")
+
+
+class _ProfiledPuzzle(Puzzle):
+    """
+    Puzzle that times its phase methods and counts current_position
+    """
+
+    __slots__ = ("phase_times", "phase_calls", "position_calls")
+
+    def __init__(self, puzzle_height, puzzle_width, initial_grid=None,
+                 verify="off"):
+        """
+        Initialize puzzle and zeroed counters
+        """
+        Puzzle.__init__(self, puzzle_height, puzzle_width, initial_grid,
+                        verify)
+        self.phase_times = dict.fromkeys(PHASE_METHODS, 0.0)
+        self.phase_calls = dict.fromkeys(PHASE_METHODS, 0)
+        self.position_calls = 0
+
+    def current_position(self, solved_row, solved_col):
+        """
+        Count and delegate to Puzzle.current_position
+        Returns a tuple of two integers
+        """
+        self.position_calls += 1
+        return Puzzle.current_position(self, solved_row, solved_col)
+
+
+def _timed(name):
+    """
+    Wrap a phase method of Puzzle so _ProfiledPuzzle records it
+    Returns a function
+    """
+    method = getattr(Puzzle, name)
+
+    def wrapper(self, *args):
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            self.phase_times[name] += time.perf_counter() - start
+            self.phase_calls[name] += 1
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in PHASE_METHODS:
+    setattr(_ProfiledPuzzle, _name, _timed(_name))
+
+
+def wall_time(grid, verify="off", repeat=REPEATS):
+    """
+    Best of repeat timed runs of building and solving the board, each
+    run solving it often enough to last MIN_REPEAT_TIME
+    Returns seconds per solve
+    """
+    height, width = len(grid), len(grid[0])
+    timer = timeit.Timer(
+        lambda: Puzzle(height, width, grid, verify).solve_puzzle())
+    number = 1
+    while timer.timeit(number) < MIN_REPEAT_TIME:
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number
+
+
+def measure(grid, verify="off", repeat=REPEATS):
+    """
+    Solve one board: timed over repeat runs for wall time, under
+    tracemalloc for peak memory and profiled for the phase breakdown
+    Returns a dict of metrics
+    """
+    height, width = len(grid), len(grid[0])
+
+    moves = Puzzle(height, width, grid, verify).solve_puzzle()
+
+    # Count the macro and placement caches the solve fills as well
+    large_board.clear_caches()
+    tracemalloc.start()
+    Puzzle(height, width, grid, verify).solve_puzzle()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    profiled = _ProfiledPuzzle(height, width, grid, verify)
+    profiled.solve_puzzle()
+
+    return {"moves": len(moves),
+            "wall_time": wall_time(grid, verify, repeat),
+            "peak_memory": peak_memory,
+            "current_position_calls": profiled.position_calls,
+            "phases": {name: {"calls": profiled.phase_calls[name],
+                              "time": profiled.phase_times[name]}
+                       for name in PHASE_METHODS}}
+
+
+def run(sizes=SIZES, boards=5, seed=0, verify="off", repeat=REPEATS):
+    """
+    Benchmark every board size on the same seeded boards
+    Returns a JSON-ready dict with the mean metrics per size
+    """
+    results = {}
+    for height, width in sizes:
+        rng = random.Random("%d-%dx%d" % (seed, height, width))
+        samples = [measure(random_board(height, width, rng), verify, repeat)
+                   for _ in range(boards)]
+        summary = {metric: sum(sample[metric] for sample in samples) / boards
+                   for metric in COMPARED}
+        summary["phases"] = {
+            name: {key: sum(sample["phases"][name][key] for sample in samples)
+                   / boards for key in ("calls", "time")}
+            for name in PHASE_METHODS}
+        results["%dx%d" % (height, width)] = summary
+    return {"meta": {"seed": seed, "boards": boards, "verify": verify,
+                     "repeat": repeat,
+                     "python": platform.python_version(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+
+def regressions(current, baseline, threshold):
+    """
+    Compare two benchmark reports size by size
+    Returns a list of human readable regression messages
+    """
+    found = []
+    for size, metrics in sorted(current["results"].items()):
+        old = baseline["results"].get(size)
+        if old is None:
+            continue
+        for metric in COMPARED:
+            if metric in old and metrics[metric] > old[metric] * (1 + threshold):
+                found.append("%s %s: %.6g -> %.6g" % (size, metric,
+                                                      old[metric],
+                                                      metrics[metric]))
+    return found
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-s", "--size", type=parse_size, action="append",
+                        help="board size such as 4x4 (repeatable)")
+    parser.add_argument("-n", "--boards", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-r", "--repeat", type=int, default=REPEATS,
+                        help="timed repeats per board, the fastest counts")
+    parser.add_argument("--verify", choices=VERIFY_MODES, default="off",
+                        help="invariant checking mode of the solver")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run(args.size or SIZES, args.boards, args.seed, args.verify,
+                 args.repeat)
+    for size, metrics in report["results"].items():
+        sys.stdout.write("%-6s %9.0f moves %9.4f s %11.0f bytes %10.0f calls\n"
+                         % (size, metrics["moves"], metrics["wall_time"],
+                            metrics["peak_memory"],
+                            metrics["current_position_calls"]))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file),
+                                args.threshold)
+        for message in found:
+            sys.stdout.write("REGRESSION " + message + "\n")
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
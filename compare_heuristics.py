@@ -0,0 +1,97 @@
+"""
+Admissibility check and node-count comparison of IDA* heuristics
+
+    python compare_heuristics.py --size 3x5 --boards 10 --walk 60
+
+Every board is solved with IDA* under each heuristic. Manhattan
+distance is admissible, so its solution length is the exact distance
+that the other heuristics' estimates of the start board must not
+exceed and their solutions must match. The report gives the nodes
+each heuristic expanded
+"""
+
+import argparse
+import sys
+import time
+
+from generator import parse_size, random_walk_board
+from heuristics import LinearConflictHeuristic, ManhattanHeuristic
+from optimal import IDAStar
+from pattern_db import WalkingDistanceHeuristic
+
+HEURISTICS = (("manhattan", ManhattanHeuristic),
+              ("linear_conflict", LinearConflictHeuristic),
+              ("walking_distance", WalkingDistanceHeuristic))
+
+
+def check_admissible(heuristic, cells, distance):
+    """
+    Compare an estimate with the exact distance of a flat board
+    Returns the estimate
+    Raises AssertionError if the estimate is too large
+    """
+    estimate = heuristic.reset(list(cells))
+    assert estimate <= distance, ("estimate %d exceeds distance %d of %s"
+                                  % (estimate, distance, list(cells)))
+    return estimate
+
+
+def compare(puzzle_height, puzzle_width, boards, heuristics=HEURISTICS):
+    """
+    Solve every flat board under every heuristic
+    Returns {name: {"nodes", "time", "estimate"}} summed over the boards
+    """
+    made = [(name, factory(puzzle_height, puzzle_width))
+            for name, factory in heuristics]
+    totals = {name: {"nodes": 0, "time": 0.0, "estimate": 0}
+              for name, _ in made}
+    for cells in boards:
+        distance = None
+        for name, heuristic in made:
+            search = IDAStar(puzzle_height, puzzle_width, heuristic)
+            start = time.perf_counter()
+            moves = search.solve(cells)
+            totals[name]["time"] += time.perf_counter() - start
+            totals[name]["nodes"] += search.nodes
+            if distance is None:
+                distance = len(moves)
+            assert len(moves) == distance, "%s solution is not optimal" % name
+            totals[name]["estimate"] += check_admissible(heuristic, cells,
+                                                         distance)
+    return totals
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Compare IDA* heuristics by nodes expanded")
+    parser.add_argument("-s", "--size", type=parse_size, action="append",
+                        help="board size such as 3x5 (repeatable)")
+    parser.add_argument("-n", "--boards", type=int, default=10)
+    parser.add_argument("--walk", type=int, default=60,
+                        help="random-walk length of the boards")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for height, width in args.size or [(3, 5), (5, 3), (4, 4)]:
+        grids = [random_walk_board(height, width, args.walk,
+                                   seed=args.seed + index)
+                 for index in range(args.boards)]
+        boards = [[value for row in grid for value in row] for grid in grids]
+        totals = compare(height, width, boards)
+        baseline = totals["manhattan"]["nodes"] or 1
+        for name, _ in HEURISTICS:
+            sys.stdout.write("%dx%d %-16s %10d nodes (%5.3f of manhattan) "
+                             "%8.3f s  mean estimate %.1f\n"
+                             % (height, width, name, totals[name]["nodes"],
+                                totals[name]["nodes"] / float(baseline),
+                                totals[name]["time"],
+                                totals[name]["estimate"] / float(args.boards)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
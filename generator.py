@@ -0,0 +1,240 @@
+"""
+Random Fifteen puzzle boards for tests, benchmarks and load testing
+
+Two kinds of boards are produced for any height x width (both at
+least 2), always solvable:
+    uniform  every solvable board equally likely: a uniform shuffle
+             whose parity is fixed with a single swap of two tiles
+    walk     k random blank moves from the solved board that never
+             undo the previous move, for difficulty-controlled corpora
+
+random_board / random_walk_board return one board as a list of rows;
+random_boards returns a NumPy (N, H, W) array and needs numpy;
+parse_size reads a HEIGHTxWIDTH size for the command line tools
+"""
+
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def permutation_parity(cells):
+    """
+    Parity of a permutation of 0..n-1 from its cycle decomposition
+    Returns 0 for even and 1 for odd
+    """
+    seen = [False] * len(cells)
+    swaps = 0
+    for start in range(len(cells)):
+        length = 0
+        pos = start
+        while not seen[pos]:
+            seen[pos] = True
+            pos = cells[pos]
+            length += 1
+        if length:
+            swaps += length - 1
+    return swaps % 2
+
+
+def _check_shape(puzzle_height, puzzle_width):
+    """
+    Parity fixing only covers boards that are at least 2x2
+    """
+    if puzzle_height < 2 or puzzle_width < 2:
+        raise ValueError("boards must be at least 2x2, got %dx%d"
+                         % (puzzle_height, puzzle_width))
+
+
+def _rows(cells, puzzle_width):
+    """
+    Split a flat board into rows
+    Returns a list of lists
+    """
+    return [list(cells[start:start + puzzle_width])
+            for start in range(0, len(cells), puzzle_width)]
+
+
+def _rng(seed):
+    """
+    Accept either a seed or an existing random.Random
+    Returns a random.Random
+    """
+    if isinstance(seed, random.Random):
+        return seed
+    return random.Random(seed)
+
+
+def random_board(puzzle_height, puzzle_width, seed=None):
+    """
+    Draw a board uniformly from all solvable boards of the given shape
+    seed may be a number or a random.Random instance
+    Returns a list of rows
+    """
+    _check_shape(puzzle_height, puzzle_width)
+    rng = _rng(seed)
+    size = puzzle_height * puzzle_width
+    cells = list(range(size))
+    rng.shuffle(cells)
+    zero_row, zero_col = divmod(cells.index(0), puzzle_width)
+    if permutation_parity(cells) != (zero_row + zero_col) % 2:
+        # Swapping two tiles flips the parity without moving the blank
+        first, second = [pos for pos in range(3) if cells[pos]][:2]
+        cells[first], cells[second] = cells[second], cells[first]
+    return _rows(cells, puzzle_width)
+
+
+def random_walk_board(puzzle_height, puzzle_width, moves, seed=None):
+    """
+    Walk the blank moves steps from the solved board, choosing among
+    the legal moves that do not undo the previous one
+    Returns a list of rows
+    """
+    _check_shape(puzzle_height, puzzle_width)
+    rng = _rng(seed)
+    size = puzzle_height * puzzle_width
+    # Blank steps in the usual u, d, l, r order; code ^ 1 undoes code
+    steps = (-puzzle_width, puzzle_width, -1, 1)
+    cells = list(range(size))
+    blank = 0
+    previous = -1
+    for _ in range(moves):
+        row, col = divmod(blank, puzzle_width)
+        legal = [code for code, ok in enumerate((row > 0,
+                                                 row < puzzle_height - 1,
+                                                 col > 0,
+                                                 col < puzzle_width - 1))
+                 if ok and code != previous ^ 1]
+        code = rng.choice(legal)
+        target = blank + steps[code]
+        cells[blank] = cells[target]
+        cells[target] = 0
+        blank = target
+        previous = code
+    return _rows(cells, puzzle_width)
+
+
+def parse_size(text):
+    """
+    Parse a HEIGHTxWIDTH board size such as a command line value
+    Returns a tuple of two integers
+    """
+    height, width = text.lower().split("x")
+    return int(height), int(width)
+
+
+#####################################################################
+# Vectorized batch generation
+
+def _require_numpy():
+    """
+    Fail clearly when the optional numpy dependency is missing
+    """
+    if numpy is None:
+        raise ImportError("batch board generation needs numpy")
+
+
+def board_dtype(size):
+    """
+    Smallest unsigned NumPy integer type for tile values 0..size-1
+    Returns a numpy dtype
+    """
+    _require_numpy()
+    if size <= 1 << 8:
+        return numpy.uint8
+    if size <= 1 << 16:
+        return numpy.uint16
+    return numpy.uint32
+
+
+def batch_parity(cells):
+    """
+    Permutation parity of every row of an (N, n) array of permutations
+    of 0..n-1, sorting all rows at once with one swap per position:
+    each swap that moves something flips the parity, so this takes
+    O(n) vector steps rather than an inversion count per column pair
+    Returns an (N,) array of 0 and 1
+    """
+    _require_numpy()
+    cells = numpy.array(cells, dtype=numpy.int64)
+    count, size = cells.shape
+    boards = numpy.arange(count)
+    # where[b, v]: current position of value v in row b
+    where = numpy.empty_like(cells)
+    where[boards[:, None], cells] = numpy.arange(size)
+    parity = numpy.zeros(count, dtype=numpy.int64)
+    for pos in range(size - 1):
+        # Swap value pos into place; the value it displaces moves out
+        source = where[:, pos]
+        displaced = cells[:, pos]
+        cells[boards, source] = displaced
+        where[boards, displaced] = source
+        parity ^= source != pos
+    return parity
+
+
+def _uniform_batch(count, puzzle_height, puzzle_width, rng):
+    """
+    Uniformly random solvable boards as an (N, H*W) array
+    Returns a numpy array
+    """
+    size = puzzle_height * puzzle_width
+    cells = numpy.tile(numpy.arange(size, dtype=board_dtype(size)), (count, 1))
+    cells = rng.permuted(cells, axis=1)
+    blank = numpy.argmin(cells, axis=1)
+    distance = (blank // puzzle_width + blank % puzzle_width) % 2
+    wrong = numpy.nonzero(batch_parity(cells) != distance)[0]
+    # Swap the first two cells that do not hold the blank
+    first = numpy.where(blank[wrong] == 0, 1, 0)
+    second = numpy.where(blank[wrong] <= 1, 2, 1)
+    held = cells[wrong, first].copy()
+    cells[wrong, first] = cells[wrong, second]
+    cells[wrong, second] = held
+    return cells
+
+
+def _walk_batch(count, puzzle_height, puzzle_width, moves, rng):
+    """
+    Non-backtracking random walks of moves steps as an (N, H*W) array
+    Returns a numpy array
+    """
+    size = puzzle_height * puzzle_width
+    cells = numpy.tile(numpy.arange(size, dtype=board_dtype(size)), (count, 1))
+    boards = numpy.arange(count)
+    steps = numpy.array((-puzzle_width, puzzle_width, -1, 1))
+    blank = numpy.zeros(count, dtype=numpy.int64)
+    previous = numpy.full(count, -1)
+    for _ in range(moves):
+        row, col = blank // puzzle_width, blank % puzzle_width
+        legal = numpy.stack((row > 0, row < puzzle_height - 1,
+                             col > 0, col < puzzle_width - 1), axis=1)
+        undo = previous >= 0
+        legal[boards[undo], previous[undo] ^ 1] = False
+        # The largest of uniform draws over legal moves is a uniform pick
+        code = numpy.argmax(numpy.where(legal, rng.random((count, 4)), -1.0),
+                            axis=1)
+        target = blank + steps[code]
+        cells[boards, blank] = cells[boards, target]
+        cells[boards, target] = 0
+        blank = target
+        previous = code
+    return cells
+
+
+def random_boards(count, puzzle_height, puzzle_width, seed=None, walk=None):
+    """
+    Generate count solvable boards at once: uniformly random, or random
+    walks of walk moves when walk is given
+    Returns a NumPy (count, puzzle_height, puzzle_width) array
+    """
+    _require_numpy()
+    _check_shape(puzzle_height, puzzle_width)
+    rng = numpy.random.default_rng(seed)
+    if walk is None:
+        cells = _uniform_batch(count, puzzle_height, puzzle_width, rng)
+    else:
+        cells = _walk_batch(count, puzzle_height, puzzle_width, walk, rng)
+    return cells.reshape(count, puzzle_height, puzzle_width)
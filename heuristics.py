@@ -0,0 +1,159 @@
+"""
+Admissible heuristics for searching over Fifteen puzzle boards
+Boards are flat row-major sequences with the blank (zero) tile
+solved in the upper left, exactly as stored by solver.Puzzle
+
+Every heuristic follows the same small protocol so searches can
+swap them freely:
+    reset(cells)                -> estimate for a whole board
+    move(cells, tile, src, dst) -> estimate after tile slid src -> dst
+The search undoes a move by calling move(cells, tile, dst, src)
+once the cells are restored
+"""
+
+
+def _line_conflicts(goals):
+    """
+    Count the tiles that have to leave a line so the remaining
+    ones are in goal order (length minus the longest increasing run)
+    Returns an integer
+    """
+    count = len(goals)
+    if count < 2:
+        return 0
+    best = [1] * count
+    longest = 1
+    for idx in range(1, count):
+        goal = goals[idx]
+        run = 1
+        for prev in range(idx):
+            if goals[prev] < goal and best[prev] >= run:
+                run = best[prev] + 1
+        best[idx] = run
+        if run > longest:
+            longest = run
+    return count - longest
+
+
+class ManhattanHeuristic:
+    """
+    Sum of the grid distances of every tile to its solved cell
+    """
+
+    def __init__(self, puzzle_height, puzzle_width):
+        """
+        Precompute solved rows and columns for the given board shape
+        """
+        self._height = puzzle_height
+        self._width = puzzle_width
+        size = puzzle_height * puzzle_width
+        self._goal_row = [value // puzzle_width for value in range(size)]
+        self._goal_col = [value % puzzle_width for value in range(size)]
+        self._estimate = 0
+
+    def tile_distance(self, tile, pos):
+        """
+        Grid distance of tile at flat position pos to its solved cell
+        Returns an integer
+        """
+        return (abs(pos // self._width - self._goal_row[tile]) +
+                abs(pos % self._width - self._goal_col[tile]))
+
+    def reset(self, cells):
+        """
+        Evaluate a whole board
+        Returns an integer
+        """
+        total = 0
+        for pos, tile in enumerate(cells):
+            if tile:
+                total += self.tile_distance(tile, pos)
+        self._estimate = total
+        return total
+
+    def move(self, cells, tile, src, dst):
+        """
+        Update the estimate after tile slid from src to dst
+        Returns an integer
+        """
+        self._estimate += (self.tile_distance(tile, dst) -
+                           self.tile_distance(tile, src))
+        return self._estimate
+
+
+class LinearConflictHeuristic(ManhattanHeuristic):
+    """
+    Manhattan distance plus two moves for every tile that must step
+    out of its goal row or column to let another tile pass
+    """
+
+    def __init__(self, puzzle_height, puzzle_width):
+        """
+        Set up per-line conflict counters for the given board shape
+        """
+        ManhattanHeuristic.__init__(self, puzzle_height, puzzle_width)
+        self._row_conflicts = [0] * puzzle_height
+        self._col_conflicts = [0] * puzzle_width
+        self._conflicts = 0
+        self._distance = 0
+
+    def _row_value(self, cells, row):
+        """
+        Conflicts among the tiles of a row that belong to that row
+        Returns an integer
+        """
+        start = row * self._width
+        goal_row = self._goal_row
+        goal_col = self._goal_col
+        return _line_conflicts([goal_col[tile]
+                                for tile in cells[start:start + self._width]
+                                if tile and goal_row[tile] == row])
+
+    def _col_value(self, cells, col):
+        """
+        Conflicts among the tiles of a column that belong to that column
+        Returns an integer
+        """
+        goal_row = self._goal_row
+        goal_col = self._goal_col
+        return _line_conflicts([goal_row[tile]
+                                for tile in cells[col::self._width]
+                                if tile and goal_col[tile] == col])
+
+    def reset(self, cells):
+        """
+        Evaluate a whole board
+        Returns an integer
+        """
+        self._distance = ManhattanHeuristic.reset(self, cells)
+        for row in range(self._height):
+            self._row_conflicts[row] = self._row_value(cells, row)
+        for col in range(self._width):
+            self._col_conflicts[col] = self._col_value(cells, col)
+        self._conflicts = sum(self._row_conflicts) + sum(self._col_conflicts)
+        self._estimate = self._distance + 2 * self._conflicts
+        return self._estimate
+
+    def move(self, cells, tile, src, dst):
+        """
+        Update the estimate after tile slid from src to dst
+        Only the two lines the tile left and entered are rescanned
+        Returns an integer
+        """
+        width = self._width
+        self._distance += (self.tile_distance(tile, dst) -
+                           self.tile_distance(tile, src))
+        if src % width == dst % width:
+            lines = self._row_conflicts
+            first, second = src // width, dst // width
+            value = self._row_value
+        else:
+            lines = self._col_conflicts
+            first, second = src % width, dst % width
+            value = self._col_value
+        old = lines[first] + lines[second]
+        lines[first] = value(cells, first)
+        lines[second] = value(cells, second)
+        self._conflicts += lines[first] + lines[second] - old
+        self._estimate = self._distance + 2 * self._conflicts
+        return self._estimate
@@ -0,0 +1,187 @@
+"""
+Optional instrumentation for the Fifteen puzzle solver
+
+Plain Puzzle objects are never touched, so solving without
+instrumentation costs nothing extra. instrumented_solve runs the
+solver on an InstrumentedPuzzle copy of the board instead, which
+records:
+    - wall time and move count per phase (lower_rows, col0,
+      top_rows, 2x2)
+    - calls to position_tile, current_position and update_puzzle;
+      position_tile applies its placements straight from large_board's
+      table unless verify is "full", so update_puzzle then only counts
+      the fixed move strings of the phases, not the placements
+    - which position_tile branch placed every tile
+and can also dump a cProfile/pstats file for the solve
+"""
+
+import cProfile
+import time
+from collections import Counter
+
+import large_board
+from solver import Puzzle
+
+PHASES = ("lower_rows", "col0", "top_rows", "2x2")
+COUNTED = ("position_tile", "current_position", "update_puzzle")
+
+
+def placement_branch(diff_row, diff_col, tile_row, tile_col):
+    """
+    Name the position_tile branch used for a tile at (tile_row,
+    tile_col) that is diff_row rows above and diff_col columns to the
+    left of (negative: right of) the blank, choosing the column 0
+    branch from the column the tile lands in like Puzzle.position_tile
+    Returns a string
+    """
+    if (diff_row > 0 and
+            large_board.landing_column(diff_row, diff_col, tile_col) == 0):
+        return "col0_up_left"
+    if diff_row == 0:
+        return "left" if diff_col > 0 else "right"
+    if diff_col == 0:
+        return "up"
+    side = "left" if diff_col > 0 else "right"
+    if diff_row > 1:
+        return "up_" + side
+    if tile_row == 0:
+        return "tight_up_" + side
+    return "straight_up_" + side
+
+
+class SolveStats:
+    """
+    Structured measurements of one instrumented solve
+    """
+
+    def __init__(self):
+        """
+        Start with every counter at zero
+        """
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.phase_moves = dict.fromkeys(PHASES, 0)
+        self.calls = dict.fromkeys(COUNTED, 0)
+        self.branches = Counter()
+        self.total_time = 0.0
+        self.moves = 0
+
+    def as_dict(self):
+        """
+        Plain, JSON-ready view of the measurements
+        Returns a dict
+        """
+        return {"total_time": self.total_time,
+                "moves": self.moves,
+                "phase_times": dict(self.phase_times),
+                "phase_moves": dict(self.phase_moves),
+                "calls": dict(self.calls),
+                "branches": dict(self.branches)}
+
+    def __str__(self):
+        """
+        Human readable summary
+        Returns a string
+        """
+        lines = ["%d moves in %.6f s" % (self.moves, self.total_time)]
+        for phase in PHASES:
+            lines.append("  %-10s %10d moves %10.6f s"
+                         % (phase, self.phase_moves[phase],
+                            self.phase_times[phase]))
+        for name in COUNTED:
+            lines.append("  %-16s %10d calls" % (name, self.calls[name]))
+        for branch, count in self.branches.most_common():
+            lines.append("  branch %-20s %8d" % (branch, count))
+        return "\n".join(lines)
+
+
+class InstrumentedPuzzle(Puzzle):
+    """
+    Puzzle that feeds a SolveStats object while it is being solved
+    """
+
+    __slots__ = ("stats",)
+
+    def __init__(self, puzzle_height, puzzle_width, initial_grid=None,
+                 verify="off", stats=None):
+        """
+        Initialize puzzle and attach the stats to record into
+        """
+        Puzzle.__init__(self, puzzle_height, puzzle_width, initial_grid,
+                        verify)
+        self.stats = stats if stats is not None else SolveStats()
+
+    def current_position(self, solved_row, solved_col):
+        """
+        Count and delegate to Puzzle.current_position
+        Returns a tuple of two integers
+        """
+        self.stats.calls["current_position"] += 1
+        return Puzzle.current_position(self, solved_row, solved_col)
+
+    def update_puzzle(self, move_string):
+        """
+        Count and delegate to Puzzle.update_puzzle
+        """
+        self.stats.calls["update_puzzle"] += 1
+        Puzzle.update_puzzle(self, move_string)
+
+    def position_tile(self, num_row, num_col):
+        """
+        Count, classify the branch and delegate to Puzzle.position_tile
+        Returns a move string
+        """
+        stats = self.stats
+        stats.calls["position_tile"] += 1
+        target_row, target_col = Puzzle.current_position(self, 0, 0)
+        tile_row, tile_col = Puzzle.current_position(self, num_row, num_col)
+        stats.branches[placement_branch(target_row - tile_row,
+                                        target_col - tile_col,
+                                        tile_row, tile_col)] += 1
+        return Puzzle.position_tile(self, num_row, num_col)
+
+
+def _run(puzzle, stats):
+    """
+    Drive the phase generator, timing every step
+    Returns the move string
+    """
+    chunks = []
+    steps = puzzle.iter_phases()
+    clock = time.perf_counter
+    start = clock()
+    while True:
+        step_start = clock()
+        try:
+            phase, moves = next(steps)
+        except StopIteration:
+            break
+        stats.phase_times[phase] += clock() - step_start
+        stats.phase_moves[phase] += len(moves)
+        chunks.append(moves)
+    stats.total_time = clock() - start
+    solution = "".join(chunks)
+    stats.moves = len(solution)
+    return solution
+
+
+def instrumented_solve(puzzle, profile=None):
+    """
+    Solve a puzzle with solve_puzzle's algorithm and the puzzle's
+    verify mode while recording statistics; profile names a file for
+    a cProfile/pstats dump
+    Updates the puzzle and returns (move string, SolveStats)
+    """
+    height, width = puzzle.get_height(), puzzle.get_width()
+    grid = [[puzzle.get_number(row, col) for col in range(width)]
+            for row in range(height)]
+    stats = SolveStats()
+    copy = InstrumentedPuzzle(height, width, grid, puzzle.get_verify(),
+                              stats=stats)
+    if profile is None:
+        solution = _run(copy, stats)
+    else:
+        profiler = cProfile.Profile()
+        solution = profiler.runcall(_run, copy, stats)
+        profiler.dump_stats(profile)
+    puzzle.update_puzzle(solution)
+    return solution, stats
@@ -0,0 +1,390 @@
+"""
+Large-board mode for the Fifteen puzzle solver
+
+Produces exactly the move string of Puzzle.solve_puzzle, but instead of
+building every placement as a fresh string and replaying it one move
+at a time, each placement is a short list of (piece, count) tokens such
+as ("lddru", diff_row - 1). A token is compiled once per board width
+into a Macro: its move bytes, the net shift of the blank and its net
+effect on the board, a handful of strided runs of cells that move
+together. Applying a macro checks the grid bounds once and moves every
+run with one slice assignment, so the per-move Python work of
+update_puzzle disappears; what is left is one inverse-index write per
+moved tile and a bytearray append per macro. Blank and tile positions
+are tracked as flat integers throughout
+
+Whole placements are memoized per width as well (placement_for), and
+Puzzle.position_tile applies them from that table. Both caches are
+LRU-bounded (MACRO_CACHE_SIZE, PLACEMENT_CACHE_SIZE) so a long-running
+process does not keep every width it ever solved; clear_caches empties
+them
+
+    python large_board.py 64 128 256
+
+prints the scaling curve of both modes on square boards
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+
+STEP = {"u": (-1, 0), "d": (1, 0), "l": (0, -1), "r": (0, 1)}
+
+# Shortest run of cells moved with one slice assignment
+MIN_RUN = 8
+
+# Placements of at most this many moves are compiled into one macro
+MERGE_LIMIT = 64
+
+# Entries kept in the LRU caches of compiled macros and placements;
+# a 128x128 solve meets about 1,400 macros and 11,000 placements
+MACRO_CACHE_SIZE = 2048
+PLACEMENT_CACHE_SIZE = 4096
+
+# Compiled macros keyed by (width, piece, count), least recent first
+_MACROS = OrderedDict()
+
+
+def _trace(moves):
+    """
+    Follow moves of the blank from (0, 0) on an unbounded grid
+    Returns ({cell: cell its tile came from}, final blank cell,
+    (min row, max row, min col, max col) of the cells visited)
+    """
+    board = {}
+    row = col = 0
+    for direction in moves:
+        step_row, step_col = STEP[direction]
+        target = (row + step_row, col + step_col)
+        board[(row, col)] = board.get(target, target)
+        board[target] = None
+        row, col = target
+    rows = [cell[0] for cell in board] or [0]
+    cols = [cell[1] for cell in board] or [0]
+    moved = {cell: source for cell, source in board.items()
+             if source is not None and source != cell}
+    return moved, (row, col), (min(rows), max(rows), min(cols), max(cols))
+
+
+class Macro:
+    """
+    A move sequence compiled for one board width
+    """
+
+    __slots__ = ("moves", "shift", "bounds", "runs", "pairs")
+
+    def __init__(self, moves, puzzle_width):
+        """
+        Trace moves once and group the cells they move into runs
+        (first cell, first source cell, stride, length) of cells that
+        all take the tile a fixed distance away, offsets relative to
+        the blank; runs shorter than MIN_RUN are kept as single
+        (cell, source cell) pairs, which are cheaper to move one by one
+        """
+        self.moves = moves.encode("ascii")
+        moved, (row, col), self.bounds = _trace(moves)
+        self.shift = row * puzzle_width + col
+
+        by_distance = {}
+        for (row, col), (source_row, source_col) in moved.items():
+            cell = row * puzzle_width + col
+            source = source_row * puzzle_width + source_col
+            by_distance.setdefault(source - cell, []).append(cell)
+        runs = []
+        for distance, cells in by_distance.items():
+            cells.sort()
+            first = 0
+            while first < len(cells):
+                stride = 1
+                if first + 1 < len(cells):
+                    stride = cells[first + 1] - cells[first]
+                length = 1
+                while (first + length < len(cells) and
+                       cells[first + length] - cells[first + length - 1] == stride):
+                    length += 1
+                runs.append((cells[first], cells[first] + distance, stride,
+                             length))
+                first += length
+        self.runs = tuple(run for run in runs if run[3] >= MIN_RUN)
+        self.pairs = tuple((cell + step * stride, source + step * stride)
+                           for cell, source, stride, length in runs
+                           if length < MIN_RUN for step in range(length))
+
+    def apply(self, cells, index, blank, puzzle_height, puzzle_width):
+        """
+        Apply the macro to flat cells and their inverse index with the
+        blank at flat position blank
+        Returns the new flat position of the blank
+        """
+        row, col = divmod(blank, puzzle_width)
+        low_row, high_row, low_col, high_col = self.bounds
+        assert (row + low_row >= 0 and row + high_row < puzzle_height and
+                col + low_col >= 0 and col + high_col < puzzle_width), \
+            "move off grid: " + self.moves.decode("ascii")
+        moved = [cells[blank + source:blank + source + stride * length:stride]
+                 for _, source, stride, length in self.runs]
+        singles = [cells[blank + source] for _, source in self.pairs]
+        for (cell, _, stride, length), tiles in zip(self.runs, moved):
+            start = blank + cell
+            stop = start + stride * length
+            cells[start:stop:stride] = tiles
+            # Consume map in C: one index write per moved tile
+            deque(map(index.__setitem__, tiles, range(start, stop, stride)), 0)
+        for (cell, _), tile in zip(self.pairs, singles):
+            cells[blank + cell] = tile
+            index[tile] = blank + cell
+        blank += self.shift
+        cells[blank] = 0
+        index[0] = blank
+        return blank
+
+
+def macro(piece, count, puzzle_width):
+    """
+    Compiled form of piece repeated count times on a board this wide
+    Returns a Macro
+    """
+    key = (puzzle_width, piece, count)
+    compiled = _MACROS.get(key)
+    if compiled is None:
+        compiled = _MACROS[key] = Macro(piece * count, puzzle_width)
+        if len(_MACROS) > MACRO_CACHE_SIZE:
+            _MACROS.popitem(last=False)
+    else:
+        _MACROS.move_to_end(key)
+    return compiled
+
+
+def landing_column(diff_row, diff_col, tile_col):
+    """
+    Column of a tile diff_row rows above and diff_col columns left of
+    the blank once the blank has walked onto it: the last step of that
+    walk pushes the tile sideways unless it is a move up
+    Returns an integer
+    """
+    if diff_row > 1 or diff_col == 0:
+        return tile_col
+    return tile_col + (1 if diff_col > 0 else -1)
+
+
+def placement(diff_row, diff_col, top_row, first_col):
+    """
+    Tokens of Puzzle.position_tile for a tile diff_row rows above and
+    diff_col columns left of the blank, top_row telling whether the
+    tile starts in row 0 and first_col whether it lands in column 0
+    when the blank reaches it
+    Returns a list of (piece, count) tokens
+    """
+    # Walk the blank onto the tile
+    tokens = [("u", int(diff_row != 0)), ("l", diff_col), ("r", -diff_col),
+              ("u", diff_row - 1)]
+    if diff_row < 0 or (diff_row == 0 and diff_col == 0):
+        return tokens
+    if first_col and diff_row > 0:
+        return tokens + [("rddlu", diff_row - 1), ("rd", 1),
+                         ("lurrd", diff_col - 1), ("l", 1)]
+    if diff_row == 0:
+        if diff_col > 0:
+            return tokens + [("urrdl", diff_col - 1)]
+        return tokens + [("ulldr", -diff_col - 1), ("ulld", 1)]
+    if diff_col == 0:
+        return tokens + [("lddru", diff_row - 1), ("ld", 1)]
+    if diff_col < 0:
+        if diff_row > 1:
+            return tokens + [("ld", 1), ("rulld", -diff_col - 1), ("rul", 1),
+                             ("lddru", diff_row - 1), ("ld", 1)]
+        if not top_row:
+            return tokens + [("ulldr", -diff_col - 1), ("ulld", 1),
+                             ("druld", 1)]
+        return tokens + [("dllur", -diff_col - 1), ("dl", 1), ("uld", 1)]
+    if diff_row > 1:
+        return tokens + [("lddru", diff_row - 1), ("rdl", 1),
+                         ("urrdl", diff_col - 1)]
+    if not top_row:
+        return tokens + [("urrdl", diff_col - 1), ("druld", 1)]
+    return tokens + [("drrul", diff_col - 1), ("dr", 1), ("uld", 1)]
+
+
+class Placement:
+    """
+    One position_tile placement compiled for one board width
+    """
+
+    __slots__ = ("moves", "macros", "blank_shift", "tile_shift")
+
+    def __init__(self, diff_row, diff_col, top_row, first_col, puzzle_width):
+        """
+        Compile the tokens of the placement into macros and record
+        its move string and the net flat shifts of blank and tile
+        """
+        macros = [macro(piece, count, puzzle_width)
+                  for piece, count in placement(diff_row, diff_col, top_row,
+                                                first_col)
+                  if count > 0]
+        self.moves = b"".join(compiled.moves
+                              for compiled in macros).decode("ascii")
+        if len(self.moves) <= MERGE_LIMIT:
+            # Short placements are cheapest as a single net permutation
+            macros = [Macro(self.moves, puzzle_width)] if self.moves else []
+        self.macros = tuple(macros)
+        self.blank_shift = sum(compiled.shift for compiled in self.macros)
+        # The tile ends where the blank started
+        self.tile_shift = diff_row * puzzle_width + diff_col
+
+    def apply(self, cells, index, blank, puzzle_height, puzzle_width):
+        """
+        Apply every macro of the placement in turn
+        Returns the new flat position of the blank
+        """
+        for compiled in self.macros:
+            blank = compiled.apply(cells, index, blank, puzzle_height,
+                                   puzzle_width)
+        return blank
+
+
+# Placements keyed by (width, diff_row, diff_col, top_row, first_col).
+# Filled lazily: a board only meets a fraction of the possible keys
+# and every entry costs O(height + width) to build, so building the
+# whole table up front would cost more than most solves. Least
+# recently used first, at most PLACEMENT_CACHE_SIZE entries
+_PLACEMENTS = OrderedDict()
+
+
+def placement_for(diff_row, diff_col, top_row, first_col, puzzle_width):
+    """
+    Memoized Placement for the given relative position of tile and blank
+    Returns a Placement
+    """
+    key = (puzzle_width, diff_row, diff_col, top_row, first_col)
+    entry = _PLACEMENTS.get(key)
+    if entry is None:
+        entry = _PLACEMENTS[key] = Placement(diff_row, diff_col, top_row,
+                                             first_col, puzzle_width)
+        if len(_PLACEMENTS) > PLACEMENT_CACHE_SIZE:
+            _PLACEMENTS.popitem(last=False)
+    else:
+        _PLACEMENTS.move_to_end(key)
+    return entry
+
+
+def clear_caches():
+    """
+    Drop every compiled macro and placement
+    """
+    _MACROS.clear()
+    _PLACEMENTS.clear()
+
+
+class LargeBoardSolver:
+    """
+    solve_puzzle's algorithm over compiled macros
+    """
+
+    def __init__(self, cells, index, puzzle_height, puzzle_width):
+        """
+        Work in place on a flat board and its inverse index
+        """
+        self._cells = cells
+        self._index = index
+        self._height = puzzle_height
+        self._width = puzzle_width
+        self._blank = index[0]
+        self._moves = bytearray()
+
+    def _run(self, piece, count=1):
+        """
+        Apply piece repeated count times and record its moves
+        """
+        if count <= 0:
+            return
+        compiled = macro(piece, count, self._width)
+        self._blank = compiled.apply(self._cells, self._index, self._blank,
+                                     self._height, self._width)
+        self._moves += compiled.moves
+
+    def position_tile(self, value):
+        """
+        Move tile value to the blank and the blank to the left of it
+        """
+        width = self._width
+        tile = self._index[value]
+        diff_row = self._blank // width - tile // width
+        diff_col = self._blank % width - tile % width
+        entry = placement_for(diff_row, diff_col, tile < width,
+                              landing_column(diff_row, diff_col,
+                                             tile % width) == 0, width)
+        self._blank = entry.apply(self._cells, self._index, self._blank,
+                                  self._height, width)
+        self._moves += entry.moves.encode("ascii")
+
+    def solve(self):
+        """
+        Solve the board phase by phase like Puzzle.iter_phases
+        Returns the moves as a bytearray
+        """
+        height, width = self._height, self._width
+        index = self._index
+        blank_row, blank_col = divmod(self._blank, width)
+        self._run("d", height - 1 - blank_row)
+        self._run("r", width - 1 - blank_col)
+
+        for row in range(height - 1, 1, -1):
+            for col in range(width - 1, 0, -1):
+                self.position_tile(row * width + col)
+            self._run("ur")
+            if index[row * width] != row * width:
+                self.position_tile(row * width)
+                self._run("ruldrdlurdluurddlur")
+            self._run("r", width - 2)
+
+        for col in range(width - 1, 1, -1):
+            self.position_tile(width + col)
+            self._run("ur")
+            self._run("ld")
+            if index[col] != col:
+                self.position_tile(col)
+                self._run("urdlurrdluldrruld")
+
+        self._run("lu")
+        while not (index[1] == 1 and index[width] == width and
+                   index[width + 1] == width + 1):
+            self._run("rdlu")
+        return self._moves
+
+
+def solve(cells, index, puzzle_height, puzzle_width):
+    """
+    Solve a flat board in place, keeping its inverse index up to date
+    Returns the move string solve_puzzle would return
+    """
+    solver = LargeBoardSolver(cells, index, puzzle_height, puzzle_width)
+    return solver.solve().decode("ascii")
+
+
+def main(argv=None):
+    """
+    Print moves and seconds of solve_puzzle and solve_large for
+    seeded random square boards of the sizes given on the command line
+    Returns a process exit code
+    """
+    from generator import random_board
+    from solver import Puzzle
+
+    sizes = [int(size) for size in (argv or sys.argv[1:])] or [32, 64, 128]
+    for size in sizes:
+        grid = random_board(size, size, seed=size)
+        timings = []
+        for method in (Puzzle.solve_puzzle, Puzzle.solve_large):
+            puzzle = Puzzle(size, size, grid)
+            start = time.perf_counter()
+            moves = method(puzzle)
+            timings.append(time.perf_counter() - start)
+        sys.stdout.write("%4dx%-4d %10d moves  solve_puzzle %8.3f s  "
+                         "solve_large %8.3f s  %6.1f ns/move\n"
+                         % (size, size, len(moves), timings[0], timings[1],
+                            timings[1] / len(moves) * 1e9))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Load generator for the solving service in service.py
+
+Sends seeded random boards from a fixed number of concurrent clients
+and reports latency percentiles (time until the whole streamed
+solution has arrived), throughput and refused requests:
+
+    python load_generator.py --requests 2000 --concurrency 64 --size 4x4
+
+With --check every returned move string is replayed on its board
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+
+from generator import parse_size, random_board
+from solver import Puzzle
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a non-empty list
+    Returns a value from the list
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def _read_body(reader, headers):
+    """
+    Read a response body, chunked or not
+    Returns bytes
+    """
+    if headers.get("transfer-encoding") != "chunked":
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+        return await reader.read()
+    parts = []
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            await reader.readline()
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readline()
+
+
+async def request_solution(host, port, grid, mode="fast"):
+    """
+    POST one board to the service
+    Returns (HTTP status, move string or None, response payload)
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps({"grid": grid, "mode": mode}).encode("utf-8")
+        writer.write(b"POST /solve HTTP/1.1\r\nHost: %s\r\n"
+                     b"Content-Type: application/json\r\n"
+                     b"Content-Length: %d\r\n\r\n%s"
+                     % (host.encode("latin-1"), len(body), body))
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        payload = await _read_body(reader, headers)
+    finally:
+        writer.close()
+    if status != 200:
+        return status, None, json.loads(payload or b"{}")
+    chunks = []
+    summary = {}
+    for line in payload.splitlines():
+        message = json.loads(line)
+        if "moves" in message:
+            chunks.append(message["moves"])
+        else:
+            summary = message
+    return status, "".join(chunks), summary
+
+
+async def run(host, port, grids, concurrency, mode="fast", check=False):
+    """
+    Send every board once using concurrency parallel clients
+    Returns a dict with latencies, status counts and elapsed seconds
+    """
+    latencies = []
+    statuses = {}
+    batches = []
+    failures = []
+    pending = iter(enumerate(grids))
+
+    async def client():
+        for index, grid in pending:
+            start = time.perf_counter()
+            try:
+                status, moves, summary = await request_solution(host, port,
+                                                                grid, mode)
+            except (ConnectionError, ValueError,
+                    asyncio.IncompleteReadError) as error:
+                status, moves, summary = "error", None, {"error": str(error)}
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status != 200:
+                continue
+            latencies.append(time.perf_counter() - start)
+            batches.append(summary.get("batch", 1))
+            if check:
+                puzzle = Puzzle(len(grid), len(grid[0]), grid)
+                puzzle.update_puzzle(moves)
+                if str(puzzle) != str(Puzzle(len(grid), len(grid[0]))):
+                    failures.append(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return {"elapsed": time.perf_counter() - start, "latencies": latencies,
+            "statuses": statuses, "batches": batches, "failures": failures}
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure latency and throughput of service.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8015)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-s", "--size", type=parse_size, default=(4, 4),
+                        help="board size such as 4x4")
+    parser.add_argument("-m", "--mode", default="fast")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true",
+                        help="replay every solution on its board")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    height, width = args.size
+    grids = [random_board(height, width, rng) for _ in range(args.requests)]
+    report = asyncio.run(run(args.host, args.port, grids, args.concurrency,
+                             args.mode, args.check))
+
+    latencies = report["latencies"]
+    # Refused and failed requests return fast, so only answered ones
+    # count as throughput
+    sys.stdout.write("%d requests in %.3f s: %.1f req/s, %d solved: "
+                     "%.1f solved/s\n"
+                     % (args.requests, report["elapsed"],
+                        args.requests / report["elapsed"], len(latencies),
+                        len(latencies) / report["elapsed"]))
+    sys.stdout.write("status counts: %s\n" % json.dumps(report["statuses"],
+                                                        sort_keys=True))
+    if latencies:
+        sys.stdout.write("latency p50 %.2f ms  p99 %.2f ms  max %.2f ms  "
+                         "mean batch %.1f\n"
+                         % (percentile(latencies, 0.50) * 1e3,
+                            percentile(latencies, 0.99) * 1e3,
+                            max(latencies) * 1e3,
+                            sum(report["batches"]) / len(report["batches"])))
+    if report["failures"]:
+        sys.stdout.write("%d solutions did not solve their board\n"
+                         % len(report["failures"]))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Compact binary encoding for Fifteen puzzle move strings
+
+Moves are coded in two bits (u=0, d=1, l=2, r=3, the same order as
+optimal.DIRECTIONS). An encoded stream is a sequence of blocks:
+    literal block  0nnnnnnn + ceil(n / 4) bytes, n in 1..127 moves,
+                   packed four per byte, first move in the high bits
+    run block      1ccLLLLL + varint(length >> 5), one direction
+                   repeated length times
+Run blocks are only used when run-length encoding is enabled and a run
+is at least RUN_THRESHOLD long (the long 'r' * n / 'u' * n stretches
+emitted by position_tile). Blocks are self-delimiting, so streams can
+be encoded and decoded chunk by chunk and simply concatenated
+"""
+
+DIRECTIONS = "udlr"
+CODES = {"u": 0, "d": 1, "l": 2, "r": 3}
+
+MAX_LITERAL = 127
+RUN_THRESHOLD = 12
+
+# Every byte of a literal block unpacked into its four directions
+_UNPACKED = [tuple(DIRECTIONS[(byte >> shift) & 3] for shift in (6, 4, 2, 0))
+             for byte in range(256)]
+
+
+def _literal_block(moves):
+    """
+    Pack up to MAX_LITERAL directions into a literal block
+    Returns a bytes object
+    """
+    block = bytearray([len(moves)])
+    for start in range(0, len(moves), 4):
+        byte = 0
+        group = moves[start:start + 4]
+        for direction in group:
+            byte = (byte << 2) | CODES[direction]
+        block.append(byte << 2 * (4 - len(group)))
+    return bytes(block)
+
+
+def _run_block(direction, length):
+    """
+    Encode a single direction repeated length times
+    Returns a bytes object
+    """
+    block = bytearray([0x80 | CODES[direction] << 5 | (length & 0x1f)])
+    rest = length >> 5
+    while True:
+        if rest < 0x80:
+            block.append(rest)
+            return bytes(block)
+        block.append(0x80 | (rest & 0x7f))
+        rest >>= 7
+
+
+def iter_encode(chunks, rle=True):
+    """
+    Encode move strings arriving in any number of chunks
+    Yields bytes blocks
+    """
+    literal = []
+    current = None
+    run = 0
+
+    def flush_run():
+        if run >= RUN_THRESHOLD and rle:
+            blocks = [_literal_block(literal[start:start + MAX_LITERAL])
+                      for start in range(0, len(literal), MAX_LITERAL)]
+            del literal[:]
+            blocks.append(_run_block(current, run))
+            return blocks
+        literal.extend(current * run)
+        blocks = []
+        while len(literal) >= MAX_LITERAL:
+            blocks.append(_literal_block(literal[:MAX_LITERAL]))
+            del literal[:MAX_LITERAL]
+        return blocks
+
+    for chunk in chunks:
+        for direction in chunk:
+            if direction == current:
+                run += 1
+                continue
+            if direction not in CODES:
+                raise ValueError("invalid direction: " + direction)
+            if run:
+                for block in flush_run():
+                    yield block
+            current = direction
+            run = 1
+    if run:
+        for block in flush_run():
+            yield block
+    for start in range(0, len(literal), MAX_LITERAL):
+        yield _literal_block(literal[start:start + MAX_LITERAL])
+
+
+def encode(move_string, rle=True):
+    """
+    Encode a whole move string
+    Returns a bytes object
+    """
+    return b"".join(iter_encode([move_string], rle))
+
+
+def _parse_block(buf, pos):
+    """
+    Locate the block starting at buf[pos]
+    Returns (end, None) for a literal block, (end, (direction, length))
+    for a run block, or None if the block is not complete yet
+    """
+    header = buf[pos]
+    if header & 0x80:
+        length = header & 0x1f
+        shift = 5
+        end = pos + 1
+        while True:
+            if end >= len(buf):
+                return None
+            byte = buf[end]
+            end += 1
+            length |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return end, (DIRECTIONS[(header >> 5) & 3], length)
+    if not header:
+        raise ValueError("empty literal block")
+    end = pos + 1 + (header + 3) // 4
+    if end > len(buf):
+        return None
+    return end, None
+
+
+def _block_moves(buf, pos, end, run):
+    """
+    Directions of one parsed block
+    Yields direction characters
+    """
+    if run is not None:
+        direction, length = run
+        for _ in range(length):
+            yield direction
+        return
+    count = buf[pos]
+    for byte in buf[pos + 1:end]:
+        for direction in _UNPACKED[byte][:count]:
+            yield direction
+        count -= 4
+
+
+def iter_decode(chunks):
+    """
+    Decode an encoded stream arriving in any number of byte chunks,
+    without building the whole move string
+    Yields direction characters
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        pos = 0
+        while pos < len(buf):
+            parsed = _parse_block(buf, pos)
+            if parsed is None:
+                break
+            end, run = parsed
+            for direction in _block_moves(buf, pos, end, run):
+                yield direction
+            pos = end
+        del buf[:pos]
+    if buf:
+        raise ValueError("truncated move stream")
+
+
+def iter_moves(data):
+    """
+    Decode one complete encoded buffer
+    Yields direction characters
+    """
+    return iter_decode([data])
+
+
+def decode(data):
+    """
+    Decode one complete encoded buffer
+    Returns a move string
+    """
+    return "".join(iter_moves(data))
@@ -0,0 +1,189 @@
+"""
+Peephole optimizer for Fifteen puzzle move strings
+Shortens solver output without changing the board it produces:
+    - cancels immediate reversals such as "lr" and "ud"
+    - drops 2x2 cycles repeated a multiple of three times, which
+      restore every tile (e.g. "rdlu" * 3)
+    - replaces short windows by the shortest move string with the same
+      effect on the board, found in a precomputed table
+"""
+
+import re
+
+INVERSE = {"u": "d", "d": "u", "l": "r", "r": "l"}
+STEP = {"u": (-1, 0), "d": (1, 0), "l": (0, -1), "r": (0, 1)}
+
+# The eight ways to walk the blank around a 2x2 block; three laps of
+# any of them put every tile back where it started
+_CYCLES = ("rdlu", "ruld", "ldru", "lurd", "drul", "dlur", "urdl", "uldr")
+_CYCLE_PATTERN = re.compile("|".join("(?:%s){3}" % cycle for cycle in _CYCLES))
+
+# Longest replacement kept in the table and longest window examined
+TABLE_DEPTH = 8
+WINDOW = 12
+
+_TABLE = {}
+
+
+def cancel_inverses(move_string):
+    """
+    Remove every move that is immediately undone by the next one
+    Returns a move string
+    """
+    stack = []
+    for direction in move_string:
+        if stack and stack[-1] == INVERSE[direction]:
+            stack.pop()
+        else:
+            stack.append(direction)
+    return "".join(stack)
+
+
+def collapse_cycles(move_string):
+    """
+    Remove triple laps of the blank around a 2x2 block
+    Returns a move string
+    """
+    previous = None
+    while previous != move_string:
+        previous = move_string
+        move_string = cancel_inverses(_CYCLE_PATTERN.sub("", move_string))
+    return move_string
+
+
+def _effect(move_string):
+    """
+    Net effect of a move string on an unbounded board, relative to the
+    starting cell of the blank
+    Returns a hashable (blank offset, displaced tiles) pair
+    """
+    row, col = 0, 0
+    where = {}
+    for direction in move_string:
+        d_row, d_col = STEP[direction]
+        row, col = _slide(where, row, col, d_row, d_col)
+    return (row, col), frozenset(where.items())
+
+
+def _slide(where, row, col, d_row, d_col):
+    """
+    Move the blank one step on an unbounded board, tracking which
+    original cell each displaced tile came from in where
+    Returns the new blank cell
+    """
+    new_cell = (row + d_row, col + d_col)
+    label = where.pop(new_cell, new_cell)
+    if label != (row, col):
+        where[(row, col)] = label
+    return new_cell
+
+
+def replacement_table(depth=TABLE_DEPTH):
+    """
+    Shortest move strings (without immediate reversals) up to depth,
+    keyed by their effect on the board. Every key keeps all of its
+    shortest strings so one that fits the board can be chosen
+    Returns a dict
+    """
+    if depth in _TABLE:
+        return _TABLE[depth]
+    table = {_effect(""): [""]}
+    layer = [""]
+    for _ in range(depth):
+        next_layer = []
+        for prefix in layer:
+            for direction in "udlr":
+                if prefix and prefix[-1] == INVERSE[direction]:
+                    continue
+                candidate = prefix + direction
+                key = _effect(candidate)
+                known = table.get(key)
+                if known is None:
+                    table[key] = [candidate]
+                    next_layer.append(candidate)
+                elif len(known[0]) == len(candidate):
+                    known.append(candidate)
+                    next_layer.append(candidate)
+        layer = next_layer
+    _TABLE[depth] = table
+    return table
+
+
+def _fits(move_string, puzzle_height, puzzle_width, row, col):
+    """
+    Check that a move string keeps the blank on the board
+    Returns a boolean
+    """
+    for direction in move_string:
+        d_row, d_col = STEP[direction]
+        row += d_row
+        col += d_col
+        if not (0 <= row < puzzle_height and 0 <= col < puzzle_width):
+            return False
+    return True
+
+
+def shorten_windows(move_string, puzzle_height, puzzle_width,
+                    zero_row, zero_col, window=WINDOW, depth=TABLE_DEPTH):
+    """
+    One left-to-right pass replacing windows of up to window moves by
+    the shortest equivalent string that stays on the board
+    Returns a move string
+    """
+    table = replacement_table(depth)
+    result = []
+    row, col = zero_row, zero_col
+    pos = 0
+    length = len(move_string)
+    while pos < length:
+        best_saving = 0
+        best = None
+        where = {}
+        b_row, b_col = 0, 0
+        for end in range(pos, min(pos + window, length)):
+            d_row, d_col = STEP[move_string[end]]
+            b_row, b_col = _slide(where, b_row, b_col, d_row, d_col)
+            size = end - pos + 1
+            if size - len(where) <= best_saving:
+                # A replacement moves each displaced tile at least once
+                continue
+            options = table.get(((b_row, b_col), frozenset(where.items())))
+            if options is None or size - len(options[0]) <= best_saving:
+                continue
+            for option in options:
+                if _fits(option, puzzle_height, puzzle_width, row, col):
+                    best_saving = size - len(option)
+                    best = (option, size, b_row, b_col)
+                    break
+        if best is None:
+            direction = move_string[pos]
+            result.append(direction)
+            d_row, d_col = STEP[direction]
+            row += d_row
+            col += d_col
+            pos += 1
+        else:
+            option, size, b_row, b_col = best
+            result.append(option)
+            row += b_row
+            col += b_col
+            pos += size
+    return "".join(result)
+
+
+def optimize_moves(move_string, puzzle_height, puzzle_width,
+                   zero_row=0, zero_col=0, window=WINDOW):
+    """
+    Shorten a move string that is legal for a board of the given shape
+    whose blank starts at (zero_row, zero_col). The result leaves the
+    board in exactly the same state
+    Returns a move string
+    """
+    move_string = collapse_cycles(cancel_inverses(move_string))
+    while True:
+        shorter = shorten_windows(move_string, puzzle_height, puzzle_width,
+                                  zero_row, zero_col, window)
+        shorter = collapse_cycles(shorter)
+        if len(shorter) >= len(move_string):
+            return move_string
+        move_string = shorter
@@ -0,0 +1,177 @@
+"""
+Optimal (shortest) solutions for the Fifteen puzzle using IDA*
+Works on flat row-major boards with the blank solved in the upper left
+and produces move strings in the same u/d/l/r alphabet as
+solver.Puzzle.update_puzzle
+"""
+
+import time
+
+from heuristics import LinearConflictHeuristic
+
+# Directions are coded so that code ^ 1 is the opposite move
+DIRECTIONS = "udlr"
+
+# Check the clock once every this many expanded nodes
+_CLOCK_INTERVAL = 4096
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised internally when a search runs out of nodes or time
+    """
+
+
+def neighbor_table(puzzle_height, puzzle_width):
+    """
+    For every blank position list the legal (direction code,
+    new blank position) pairs
+    Returns a list of tuples
+    """
+    table = []
+    for pos in range(puzzle_height * puzzle_width):
+        row, col = divmod(pos, puzzle_width)
+        moves = []
+        if row > 0:
+            moves.append((0, pos - puzzle_width))
+        if row < puzzle_height - 1:
+            moves.append((1, pos + puzzle_width))
+        if col > 0:
+            moves.append((2, pos - 1))
+        if col < puzzle_width - 1:
+            moves.append((3, pos + 1))
+        table.append(tuple(moves))
+    return table
+
+
+class IDAStar:
+    """
+    Iterative deepening A* over a single mutable board
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, heuristic=None,
+                 max_nodes=None, time_limit=None):
+        """
+        Prepare a search for boards of the given shape
+        heuristic follows the protocol in heuristics.py and defaults to
+        Manhattan distance plus linear conflicts
+        """
+        if heuristic is None:
+            heuristic = LinearConflictHeuristic(puzzle_height, puzzle_width)
+        self._height = puzzle_height
+        self._width = puzzle_width
+        self._heuristic = heuristic
+        self._neighbors = neighbor_table(puzzle_height, puzzle_width)
+        self._max_nodes = max_nodes
+        self._time_limit = time_limit
+        self._deadline = None
+        self._cells = None
+        self._path = []
+        self.nodes = 0
+
+    def _interrupted(self):
+        """
+        Polled every _CLOCK_INTERVAL nodes; subclasses may add reasons
+        to give up, such as another process having found a solution
+        Returns a boolean
+        """
+        return self._deadline is not None and time.time() > self._deadline
+
+    def _search(self, blank, depth, bound, estimate, prev):
+        """
+        Depth-first search below the current board limited to bound
+        Returns 0 when solved, otherwise the smallest exceeded f-value
+        """
+        total = depth + estimate
+        if total > bound:
+            return total
+        cells = self._cells
+        if estimate == 0 and all(cells[pos] == pos for pos in range(len(cells))):
+            return 0
+
+        self.nodes += 1
+        if self._max_nodes is not None and self.nodes > self._max_nodes:
+            raise BudgetExceeded()
+        if not self.nodes % _CLOCK_INTERVAL and self._interrupted():
+            raise BudgetExceeded()
+
+        heuristic = self._heuristic
+        path = self._path
+        smallest = None
+        for code, target in self._neighbors[blank]:
+            if code ^ 1 == prev:
+                continue
+            # Move: the tile at target slides into the blank
+            tile = cells[target]
+            cells[blank] = tile
+            cells[target] = 0
+            path.append(code)
+            result = self._search(target, depth + 1, bound,
+                                  heuristic.move(cells, tile, target, blank),
+                                  code)
+            if result == 0:
+                return 0
+            # Unmove
+            path.pop()
+            cells[target] = tile
+            cells[blank] = 0
+            heuristic.move(cells, tile, blank, target)
+            if smallest is None or result < smallest:
+                smallest = result
+        return smallest
+
+    def bounded_search(self, cells, depth, bound, prev=-1):
+        """
+        One depth-first pass, limited to bound, below a board that is
+        depth moves from the start, prev being the code of the last of
+        them (-1 if none); used to search subtrees of a split search
+        Raises BudgetExceeded if the budget ran out or the search
+        was interrupted
+        Returns (move string, None) if a solution of length at most
+        bound was found, otherwise (None, smallest exceeded f-value or
+        None when the subtree is exhausted)
+        """
+        self._cells = list(cells)
+        self._path = []
+        estimate = self._heuristic.reset(self._cells)
+        result = self._search(self._cells.index(0), depth, bound, estimate,
+                              prev)
+        if result == 0:
+            return "".join(DIRECTIONS[code] for code in self._path), None
+        return None, result
+
+    def solve(self, cells):
+        """
+        Search for a shortest solution of the board given as a flat
+        row-major sequence
+        Returns a move string, or None if the node or time budget ran out
+        """
+        self._cells = list(cells)
+        self._path = []
+        self.nodes = 0
+        if self._time_limit is not None:
+            self._deadline = time.time() + self._time_limit
+        blank = self._cells.index(0)
+        bound = self._heuristic.reset(self._cells)
+        try:
+            while True:
+                estimate = self._heuristic.reset(self._cells)
+                result = self._search(blank, 0, bound, estimate, -1)
+                if result == 0:
+                    return "".join(DIRECTIONS[code] for code in self._path)
+                if result is None:
+                    return None
+                bound = result
+        except BudgetExceeded:
+            return None
+
+
+def solve_optimal(cells, puzzle_height, puzzle_width, heuristic=None,
+                  max_nodes=None, time_limit=None):
+    """
+    Find a shortest solution for a flat row-major board
+    Returns a move string, or None if the budget ran out
+    """
+    search = IDAStar(puzzle_height, puzzle_width, heuristic,
+                     max_nodes, time_limit)
+    return search.solve(cells)
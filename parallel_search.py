@@ -0,0 +1,313 @@
+"""
+Multi-core optimal solving for the Fifteen puzzle: IDA* split at the root
+
+The first few plies below the start board are expanded in this
+process, and every distinct board on the last ply becomes a subtree
+that a process pool searches with IDAStar.bounded_search. All workers
+of one iteration use the same cost threshold, read from shared memory,
+and fold the smallest f-value they saw above it into a second shared
+value, which becomes the next threshold. Any solution found at a
+threshold is optimal, since no solution fits under the previous one,
+so the first worker to find one raises a shared flag. The other
+workers poll that flag while they search and stop early, and subtrees
+still queued are cancelled. One ParallelIDAStar keeps its pool for
+all iterations and all boards it solves until it is closed.
+
+    python parallel_search.py --workers 1 2 4 8 --boards 3
+
+prints the speedup curve over 1..N workers on seeded random-walk boards
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from generator import random_walk_board
+from heuristics import LinearConflictHeuristic
+from optimal import DIRECTIONS, BudgetExceeded, IDAStar, neighbor_table
+
+# Larger than any f-value: "no board exceeded the threshold"
+UNBOUNDED = 1 << 30
+
+# Subtrees wanted per worker when choosing how deep to split
+SUBTREES_PER_WORKER = 8
+
+# Per-process state set up by _init_worker
+_WORKER = {}
+
+
+class _SubtreeSearch(IDAStar):
+    """
+    IDAStar that also gives up once another worker found a solution
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, heuristic, found):
+        """
+        found is the shared flag raised by the first solution
+        """
+        IDAStar.__init__(self, puzzle_height, puzzle_width, heuristic)
+        self.found = found
+        self.deadline = None
+
+    def _interrupted(self):
+        """
+        Stop on a solution elsewhere or when the deadline passed
+        Returns a boolean
+        """
+        return bool(self.found.value) or (self.deadline is not None and
+                                          time.time() > self.deadline)
+
+
+def _init_worker(puzzle_height, puzzle_width, heuristic, found, threshold,
+                 next_threshold):
+    """
+    Pool initializer: keep the shared values and a search object
+    """
+    _WORKER["search"] = _SubtreeSearch(puzzle_height, puzzle_width,
+                                       heuristic, found)
+    _WORKER["found"] = found
+    _WORKER["threshold"] = threshold
+    _WORKER["next"] = next_threshold
+
+
+def _search_subtree(cells, depth, prev, deadline):
+    """
+    Pool entry point: search one subtree under the shared threshold
+    Returns (move string or None, nodes expanded)
+    """
+    search = _WORKER["search"]
+    if _WORKER["found"].value:
+        return None, 0
+    search.nodes = 0
+    search.deadline = deadline
+    try:
+        moves, exceeded = search.bounded_search(cells, depth,
+                                                _WORKER["threshold"].value,
+                                                prev)
+    except BudgetExceeded:
+        return None, search.nodes
+    if moves is not None:
+        _WORKER["found"].value = 1
+        return moves, search.nodes
+    if exceeded is not None:
+        next_threshold = _WORKER["next"]
+        with next_threshold.get_lock():
+            if exceeded < next_threshold.value:
+                next_threshold.value = exceeded
+    return None, search.nodes
+
+
+def split(cells, puzzle_height, puzzle_width, depth):
+    """
+    Expand depth plies below a flat board without undoing the last
+    move, keeping one path to every distinct board
+    Returns (list of (path, cells, last code) on the last ply, path to
+    the solved board if it was met on the way or None)
+    """
+    neighbors = neighbor_table(puzzle_height, puzzle_width)
+    goal = tuple(range(puzzle_height * puzzle_width))
+    layer = [("", tuple(cells), -1)]
+    for _ in range(depth):
+        seen = set()
+        next_layer = []
+        for path, board, prev in layer:
+            if board == goal:
+                return [], path
+            blank = board.index(0)
+            for code, target in neighbors[blank]:
+                if code ^ 1 == prev:
+                    continue
+                moved = list(board)
+                moved[blank], moved[target] = moved[target], 0
+                moved = tuple(moved)
+                if moved not in seen:
+                    seen.add(moved)
+                    next_layer.append((path + DIRECTIONS[code], moved, code))
+        layer = next_layer
+    for path, board, _ in layer:
+        if board == goal:
+            return [], path
+    return layer, None
+
+
+def split_depth(workers):
+    """
+    Smallest number of plies giving about SUBTREES_PER_WORKER subtrees
+    per worker (each ply roughly doubles to triples the count)
+    Returns an integer
+    """
+    depth = 1
+    while 2 ** depth < SUBTREES_PER_WORKER * workers and depth < 12:
+        depth += 1
+    return depth
+
+
+class ParallelIDAStar:
+    """
+    Root-split IDA* over a process pool, started on the first solve
+    and reused by later ones; close it (or use it in a with block)
+    when done
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, workers=None,
+                 heuristic=None, depth=None, time_limit=None):
+        """
+        heuristic follows the protocol in heuristics.py and is pickled
+        into every worker; the pattern_db heuristics pickle as their
+        constructor arguments and map their table files again there.
+        depth is the number of plies expanded before splitting (chosen
+        from the worker count by default)
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if heuristic is None:
+            heuristic = LinearConflictHeuristic(puzzle_height, puzzle_width)
+        self._height = puzzle_height
+        self._width = puzzle_width
+        self._workers = workers
+        self._heuristic = heuristic
+        self._depth = (depth if depth is not None else
+                       split_depth(workers))
+        self._time_limit = time_limit
+        self._executor = None
+        self._found = None
+        self._threshold = None
+        self._next = None
+        self.nodes = 0
+        self.iterations = 0
+
+    def __enter__(self):
+        """
+        Returns the search itself
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Shut the pool down on leaving the with block
+        """
+        self.close()
+
+    def _pool(self):
+        """
+        Start the workers and their shared values on first use
+        Returns a ProcessPoolExecutor
+        """
+        if self._executor is None:
+            self._found = multiprocessing.Value("b", 0)
+            self._threshold = multiprocessing.Value("i", 0, lock=False)
+            self._next = multiprocessing.Value("i", UNBOUNDED)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers, initializer=_init_worker,
+                initargs=(self._height, self._width, self._heuristic,
+                          self._found, self._threshold, self._next))
+        return self._executor
+
+    def close(self):
+        """
+        Shut the worker pool down
+        """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def solve(self, cells):
+        """
+        Search for a shortest solution of a flat row-major board
+        Returns a move string, or None if the time ran out or the
+        board cannot be solved
+        """
+        self.nodes = 0
+        self.iterations = 0
+        deadline = None
+        if self._time_limit is not None:
+            deadline = time.time() + self._time_limit
+        subtrees, moves = split(cells, self._height, self._width, self._depth)
+        if moves is not None:
+            return moves
+
+        executor = self._pool()
+        found, threshold, next_threshold = (self._found, self._threshold,
+                                            self._next)
+        found.value = 0
+        threshold.value = self._heuristic.reset(list(cells))
+        while True:
+            self.iterations += 1
+            next_threshold.value = UNBOUNDED
+            pending = {executor.submit(_search_subtree, board, self._depth,
+                                       prev, deadline): path
+                       for path, board, prev in subtrees}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    moves, nodes = future.result()
+                    self.nodes += nodes
+                    if moves is not None:
+                        for other in pending:
+                            other.cancel()
+                        # Subtrees already running stop on the flag;
+                        # let them finish before the next solve clears it
+                        wait(pending)
+                        return path + moves
+            if deadline is not None and time.time() > deadline:
+                return None
+            if next_threshold.value == UNBOUNDED:
+                return None
+            threshold.value = next_threshold.value
+
+
+def solve_parallel(cells, puzzle_height, puzzle_width, workers=None,
+                   heuristic=None, time_limit=None):
+    """
+    Find a shortest solution for a flat row-major board on a process pool
+    Returns a move string, or None if the time ran out
+    """
+    with ParallelIDAStar(puzzle_height, puzzle_width, workers, heuristic,
+                         time_limit=time_limit) as search:
+        return search.solve(cells)
+
+
+def main(argv=None):
+    """
+    Print wall time and speedup over worker counts on seeded boards
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Speedup curve of root-split parallel IDA*")
+    parser.add_argument("-w", "--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8])
+    parser.add_argument("-n", "--boards", type=int, default=3)
+    parser.add_argument("--walk", type=int, default=80,
+                        help="random-walk length of the boards")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grids = [random_walk_board(4, 4, args.walk, seed=args.seed + index)
+             for index in range(args.boards)]
+    boards = [[value for row in grid for value in row] for grid in grids]
+
+    start = time.perf_counter()
+    lengths = [len(IDAStar(4, 4).solve(board)) for board in boards]
+    sequential = time.perf_counter() - start
+    sys.stdout.write("solution lengths %s\nsequential IDAStar %8.3f s\n"
+                     % (lengths, sequential))
+    sys.stdout.write("%d CPUs\n" % multiprocessing.cpu_count())
+    baseline = None
+    for workers in args.workers:
+        with ParallelIDAStar(4, 4, workers) as search:
+            start = time.perf_counter()
+            for board, length in zip(boards, lengths):
+                moves = search.solve(board)
+                assert len(moves) == length, "parallel solution is not optimal"
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        sys.stdout.write("%3d workers %8.3f s  speedup %5.2f\n"
+                         % (workers, elapsed, baseline / elapsed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,727 @@
+"""
+Precomputed pattern databases for the Fifteen puzzle
+Disjoint additive databases are built by breadth-first search over
+abstracted boards where only a group of tiles is distinguished and
+only moves of those tiles are counted, so the per-group distances
+can be summed into one admissible estimate. Walking distance tables
+do the same for rows and columns of any rectangular board: only the
+line every tile belongs to is kept, so a row table counts vertical
+moves and a column table horizontal ones
+
+Tables are flat byte arrays stored on disk and loaded through a
+read-only memory map, so they cost nothing to load twice and the
+pages are shared between processes that use the same file
+"""
+
+import mmap
+import os
+from array import array
+
+# Where built tables are cached, overridable with FIFTEEN_PDB_DIR
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "fifteen_puzzle")
+
+# Partition of the tiles 1..15 used for 4x4 boards by default
+# Any disjoint partition is admissible; (7, 8) style partitions give
+# stronger estimates but take much longer to build
+PARTITION_4X4 = ((1, 4, 5, 8, 9, 12),
+                 (2, 3, 6, 7, 10, 11),
+                 (13, 14, 15))
+
+UNKNOWN = 255
+
+# Largest board with a full distance table (9! = 362,880 entries)
+MAX_FULL_TABLE_CELLS = 9
+
+
+def table_directory(directory=None):
+    """
+    Resolve the directory that holds database files
+    Returns a string
+    """
+    if directory is None:
+        directory = os.environ.get("FIFTEEN_PDB_DIR", DEFAULT_DIRECTORY)
+    return directory
+
+
+def _neighbors(puzzle_height, puzzle_width):
+    """
+    Flat positions adjacent to every cell of the board
+    Returns a list of tuples
+    """
+    table = []
+    for pos in range(puzzle_height * puzzle_width):
+        row, col = divmod(pos, puzzle_width)
+        cells = []
+        if row > 0:
+            cells.append(pos - puzzle_width)
+        if row < puzzle_height - 1:
+            cells.append(pos + puzzle_width)
+        if col > 0:
+            cells.append(pos - 1)
+        if col < puzzle_width - 1:
+            cells.append(pos + 1)
+        table.append(tuple(cells))
+    return table
+
+
+def _save(path, table):
+    """
+    Write a table to disk atomically
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    temp_path = path + ".tmp%d" % os.getpid()
+    with open(temp_path, "wb") as table_file:
+        table_file.write(table)
+    os.replace(temp_path, path)
+
+
+def _load(path):
+    """
+    Memory-map a table file read-only
+    Returns an mmap object
+    """
+    with open(path, "rb") as table_file:
+        return mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+#####################################################################
+# Additive pattern databases
+
+def pattern_weights(size, tiles):
+    """
+    Mixed-radix weights that turn the positions of the pattern tiles
+    into a table index (the first tile is the most significant digit)
+    Returns a tuple of integers
+    """
+    count = len(tiles)
+    return tuple(size ** (count - 1 - idx) for idx in range(count))
+
+
+def build_pattern_table(puzzle_height, puzzle_width, tiles):
+    """
+    Breadth-first search from the solved board over placements of
+    the given tiles. The blank wanders over the other cells for free,
+    every move of a pattern tile costs one
+    Returns a bytearray indexed by the placement of the pattern tiles
+    """
+    size = puzzle_height * puzzle_width
+    count = len(tiles)
+    weights = pattern_weights(size, tiles)
+    neighbors = _neighbors(puzzle_height, puzzle_width)
+    table = bytearray([UNKNOWN]) * (size ** count)
+    # One bit per (placement, blank cell) pair already reached
+    seen = bytearray((size ** count * size + 7) // 8)
+    occupant = [-1] * size
+
+    goal = sum(tile * weight for tile, weight in zip(tiles, weights))
+    frontier = [goal * size]
+    depth = 0
+    while frontier:
+        next_frontier = []
+        for state in frontier:
+            index, blank = divmod(state, size)
+            bit = index * size + blank
+            if seen[bit >> 3] & (1 << (bit & 7)):
+                continue
+            if table[index] == UNKNOWN:
+                table[index] = depth
+
+            # Decode the placement into an occupancy map
+            rest = index
+            for idx in range(count - 1, -1, -1):
+                rest, pos = divmod(rest, size)
+                occupant[pos] = idx
+
+            # Flood the region of free cells reachable by the blank
+            stack = [blank]
+            seen[bit >> 3] |= 1 << (bit & 7)
+            while stack:
+                cell = stack.pop()
+                for other in neighbors[cell]:
+                    tile_idx = occupant[other]
+                    if tile_idx < 0:
+                        bit = index * size + other
+                        if not seen[bit >> 3] & (1 << (bit & 7)):
+                            seen[bit >> 3] |= 1 << (bit & 7)
+                            stack.append(other)
+                    else:
+                        # Pattern tile slides into the blank: costs a move
+                        moved = index + (cell - other) * weights[tile_idx]
+                        bit = moved * size + other
+                        if not seen[bit >> 3] & (1 << (bit & 7)):
+                            next_frontier.append(moved * size + other)
+
+            rest = index
+            for idx in range(count):
+                rest, pos = divmod(rest, size)
+                occupant[pos] = -1
+        frontier = next_frontier
+        depth += 1
+    return table
+
+
+def pattern_path(puzzle_height, puzzle_width, tiles, directory=None):
+    """
+    File name of the table for a board shape and tile group
+    Returns a string
+    """
+    name = "%dx%d-pdb-%s.bin" % (puzzle_height, puzzle_width,
+                                 "_".join(str(tile) for tile in tiles))
+    return os.path.join(table_directory(directory), name)
+
+
+def load_pattern_table(puzzle_height, puzzle_width, tiles, directory=None):
+    """
+    Memory-map the table for a tile group, building and saving it
+    first if it is not on disk yet
+    Returns an mmap object
+    """
+    path = pattern_path(puzzle_height, puzzle_width, tiles, directory)
+    if not os.path.exists(path):
+        _save(path, build_pattern_table(puzzle_height, puzzle_width, tiles))
+    return _load(path)
+
+
+class PatternDatabaseHeuristic:
+    """
+    Sum of disjoint pattern database lookups
+    Follows the heuristic protocol from heuristics.py; each move
+    touches one table index so updates are constant time
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, partition=None,
+                 directory=None):
+        """
+        Load (or build) one table per tile group in the partition
+        """
+        self._args = (puzzle_height, puzzle_width, partition, directory)
+        size = puzzle_height * puzzle_width
+        if partition is None:
+            if (puzzle_height, puzzle_width) != (4, 4):
+                raise ValueError("no default partition for a %dx%d board"
+                                 % (puzzle_height, puzzle_width))
+            partition = PARTITION_4X4
+        tiles = sorted(tile for group in partition for tile in group)
+        if tiles != list(range(1, size)):
+            raise ValueError("partition must cover every tile exactly once")
+        self._tables = [load_pattern_table(puzzle_height, puzzle_width,
+                                           group, directory)
+                        for group in partition]
+        # tile -> (group number, index weight)
+        self._group = [None] * size
+        for number, group in enumerate(partition):
+            for tile, weight in zip(group, pattern_weights(size, group)):
+                self._group[tile] = (number, weight)
+        self._indices = [0] * len(partition)
+        self._estimate = 0
+
+    def __reduce__(self):
+        """
+        Pickle as the constructor arguments: memory maps cannot be
+        pickled, so a copy in another process maps the files again
+        """
+        return self.__class__, self._args
+
+    def reset(self, cells):
+        """
+        Evaluate a whole board
+        Returns an integer
+        """
+        indices = [0] * len(self._tables)
+        for pos, tile in enumerate(cells):
+            if tile:
+                number, weight = self._group[tile]
+                indices[number] += pos * weight
+        self._indices = indices
+        self._estimate = sum(table[index]
+                             for table, index in zip(self._tables, indices))
+        return self._estimate
+
+    def move(self, cells, tile, src, dst):
+        """
+        Update the estimate after tile slid from src to dst
+        Returns an integer
+        """
+        number, weight = self._group[tile]
+        table = self._tables[number]
+        old = self._indices[number]
+        new = old + (dst - src) * weight
+        self._indices[number] = new
+        self._estimate += table[new] - table[old]
+        return self._estimate
+
+
+#####################################################################
+# Full distance tables for small boards
+
+def permutation_rank(cells):
+    """
+    Lexicographic rank of a permutation of 0..n-1
+    Returns an integer
+    """
+    size = len(cells)
+    rank = 0
+    for pos in range(size):
+        smaller = 0
+        value = cells[pos]
+        for later in range(pos + 1, size):
+            if cells[later] < value:
+                smaller += 1
+        rank = rank * (size - pos) + smaller
+    return rank
+
+
+def build_full_table(puzzle_height, puzzle_width):
+    """
+    Breadth-first search from the solved board over every reachable
+    board; only sensible for tiny boards (3x3 has 181,440 states)
+    Returns a bytearray of exact distances indexed by permutation_rank
+    """
+    size = puzzle_height * puzzle_width
+    total = 1
+    for factor in range(2, size + 1):
+        total *= factor
+    neighbors = _neighbors(puzzle_height, puzzle_width)
+    table = bytearray([UNKNOWN]) * total
+
+    start = tuple(range(size))
+    table[permutation_rank(start)] = 0
+    frontier = [(start, 0)]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for board, blank in frontier:
+            for other in neighbors[blank]:
+                cells = list(board)
+                cells[blank] = cells[other]
+                cells[other] = 0
+                rank = permutation_rank(cells)
+                if table[rank] == UNKNOWN:
+                    table[rank] = depth
+                    next_frontier.append((tuple(cells), other))
+        frontier = next_frontier
+    return table
+
+
+def full_path(puzzle_height, puzzle_width, directory=None):
+    """
+    File name of the full distance table for a board shape
+    Returns a string
+    """
+    name = "%dx%d-full.bin" % (puzzle_height, puzzle_width)
+    return os.path.join(table_directory(directory), name)
+
+
+def load_full_table(puzzle_height, puzzle_width, directory=None):
+    """
+    Memory-map the full distance table for a board shape, building
+    and saving it first if it is not on disk yet
+    Returns an mmap object
+    """
+    path = full_path(puzzle_height, puzzle_width, directory)
+    if not os.path.exists(path):
+        _save(path, build_full_table(puzzle_height, puzzle_width))
+    return _load(path)
+
+
+class FullTableHeuristic:
+    """
+    Exact distance read from a full table (perfect heuristic)
+    Follows the heuristic protocol from heuristics.py
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, directory=None):
+        """
+        Load (or build) the full table for the board shape
+        """
+        self._args = (puzzle_height, puzzle_width, directory)
+        self._table = load_full_table(puzzle_height, puzzle_width, directory)
+        self._estimate = 0
+
+    def __reduce__(self):
+        """
+        Pickle as the constructor arguments: memory maps cannot be
+        pickled, so a copy in another process maps the files again
+        """
+        return self.__class__, self._args
+
+    def reset(self, cells):
+        """
+        Evaluate a whole board
+        Returns an integer
+        """
+        self._estimate = self._table[permutation_rank(cells)]
+        return self._estimate
+
+    def move(self, cells, tile, src, dst):
+        """
+        Update the estimate after tile slid from src to dst
+        Returns an integer
+        """
+        return self.reset(cells)
+
+
+#####################################################################
+# Walking distance tables
+
+# Line abstractions with more states than this are not built; the
+# heuristic counts Manhattan distance along that axis instead
+MAX_WALKING_STATES = 1000000
+
+# State counts by (lines, length); counting takes seconds on large axes
+_WALKING_STATES = {}
+
+
+def _compositions(total, caps):
+    """
+    Ways to split total into len(caps) parts, each at most its cap
+    Yields tuples
+    """
+    if len(caps) == 1:
+        if total <= caps[0]:
+            yield (total,)
+        return
+    # The other parts hold at most sum(caps[1:]), so smaller first
+    # parts lead nowhere
+    lowest = max(0, total - sum(caps[1:]))
+    for first in range(lowest, min(total, caps[0]) + 1):
+        for rest in _compositions(total - first, caps[1:]):
+            yield (first,) + rest
+
+
+def _walking_lower_bound(lines, length):
+    """
+    Cheap lower bound on walking_states, from two families of states
+    with the blank in its goal line where any two lines trade the same
+    number of tiles each way: trades only between neighbouring lines
+    (counted by a small DP over the sequence of trades), and trades of
+    up to (length - 1) // (lines - 1) tiles between every pair of lines
+    Returns an integer
+    """
+    sizes = [length - (line == 0) for line in range(lines)]
+    # ways[a]: neighbour trade sequences so far whose last trade is a
+    ways = [1] + [0] * length
+    for line in range(lines - 1):
+        ways = [sum(ways[before] for before in range(length + 1)
+                    if before + after <= sizes[line])
+                for after in range(length + 1)]
+    banded = sum(count for before, count in enumerate(ways)
+                 if before <= sizes[lines - 1])
+    uniform = ((length - 1) // (lines - 1) + 1) ** (lines * (lines - 1) // 2)
+    return max(banded, uniform)
+
+
+def walking_states(lines, length, limit=None):
+    """
+    Number of states of the line abstraction with the given number of
+    lines of length cells: for every blank line, the count of
+    lines x lines matrices (line, goal line) -> number of tiles whose
+    sums match the tiles in each line and the tiles of each goal line.
+    With a limit, counting stops once the total exceeds it, since the
+    exact count of a large abstraction can take minutes
+    Returns an integer, limit + 1 for abstractions beyond the limit
+    """
+    total = _WALKING_STATES.get((lines, length))
+    if total is not None:
+        return total if limit is None else min(total, limit + 1)
+    cap = None if limit is None else limit + 1
+    if cap is not None and _walking_lower_bound(lines, length) >= cap:
+        return cap
+    total = 0
+    goal_sums = tuple(length - (goal == 0) for goal in range(lines))
+    for blank in range(lines):
+        line_sums = [length - (line == blank) for line in range(lines)]
+        counted = {}
+
+        def fill(line, remaining):
+            if line == lines:
+                return 1
+            key = (line, remaining)
+            if key not in counted:
+                count = 0
+                for split in _compositions(line_sums[line], remaining):
+                    count += fill(line + 1, tuple(left - used for left, used
+                                                  in zip(remaining, split)))
+                    if cap is not None and count >= cap:
+                        # Counts saturate at cap, which keeps the
+                        # memoized partial counts valid lower bounds
+                        count = cap
+                        break
+                counted[key] = count
+            return counted[key]
+
+        total += fill(0, goal_sums)
+        if cap is not None and total >= cap:
+            return cap
+    _WALKING_STATES[(lines, length)] = total
+    return total
+
+
+def build_walking_table(lines, length):
+    """
+    Breadth-first search over the line abstraction of a board with
+    the given number of lines of length cells (rows of a board are
+    lines of width cells, columns are lines of height cells). A state
+    records how many tiles of every goal line sit in every line, plus
+    the line of the blank; a move carries one tile into the blank's
+    line from the line above or below. States are packed into
+    integers, digit line * lines + goal of base length + 1 holding a
+    count and the top digit holding the blank line
+    Returns (sorted keys, distance per key, links) where links has
+    2 * lines entries per state: the state reached when the blank
+    moves to the line above (first lines entries) or below, carrying
+    a tile of each goal line, or -1
+    """
+    base = length + 1
+    digit = [base ** place for place in range(lines * lines + 1)]
+    blank_digit = digit[lines * lines]
+    goal = sum((length - (line == 0)) * digit[line * lines + line]
+               for line in range(lines))
+
+    order = [goal]
+    found = {goal: 0}
+    distances = [0]
+    head = 0
+    while head < len(order):
+        key = order[head]
+        head += 1
+        blank = key // blank_digit
+        for other in (blank - 1, blank + 1):
+            if not 0 <= other < lines:
+                continue
+            for goal_line in range(lines):
+                place = digit[other * lines + goal_line]
+                if (key // place) % base:
+                    moved = (key - place + digit[blank * lines + goal_line] +
+                             (other - blank) * blank_digit)
+                    if moved not in found:
+                        found[moved] = len(order)
+                        order.append(moved)
+                        distances.append(distances[head - 1] + 1)
+
+    keys = sorted(order)
+    rank = {key: number for number, key in enumerate(keys)}
+    dist = bytearray(len(keys))
+    links = array('i', [-1]) * (2 * lines * len(keys))
+    for key, distance in zip(order, distances):
+        number = rank[key]
+        dist[number] = distance
+        blank = key // blank_digit
+        for side, other in enumerate((blank - 1, blank + 1)):
+            if not 0 <= other < lines:
+                continue
+            for goal_line in range(lines):
+                place = digit[other * lines + goal_line]
+                if (key // place) % base:
+                    moved = (key - place + digit[blank * lines + goal_line] +
+                             (other - blank) * blank_digit)
+                    links[(2 * number + side) * lines + goal_line] = rank[moved]
+    return keys, dist, links
+
+
+def walking_path(lines, length, directory=None):
+    """
+    File name of the walking distance table for a line abstraction
+    Returns a string
+    """
+    name = "%dx%d-wd.bin" % (lines, length)
+    return os.path.join(table_directory(directory), name)
+
+
+def has_walking_table(lines, length, directory=None):
+    """
+    Check whether a line abstraction has a table on disk or is small
+    enough (at most MAX_WALKING_STATES states) to build one
+    Returns a boolean
+    """
+    return (os.path.exists(walking_path(lines, length, directory)) or
+            walking_states(lines, length, MAX_WALKING_STATES) <=
+            MAX_WALKING_STATES)
+
+
+class WalkingTable:
+    """
+    Memory-mapped walking distance table of one line abstraction
+
+    File layout: state count and key width as two uint32, the links
+    as int32, one distance byte per state, then the sorted keys as
+    fixed-width big-endian integers
+    """
+
+    def __init__(self, lines, length, directory=None):
+        """
+        Load (or build and save) the table
+        """
+        self.lines = lines
+        self.length = length
+        path = walking_path(lines, length, directory)
+        if not os.path.exists(path):
+            keys, dist, links = build_walking_table(lines, length)
+            width = (keys[-1].bit_length() + 7) // 8
+            data = bytearray(array('I', [len(keys), width]).tobytes())
+            data += links.tobytes()
+            data += dist
+            data += b"".join(key.to_bytes(width, "big") for key in keys)
+            _save(path, data)
+        self._map = _load(path)
+        view = memoryview(self._map)
+        self.count, self._width = view[:8].cast('I')
+        end = 8 + 8 * lines * self.count
+        self.links = view[8:end].cast('i')
+        self.dist = view[end:end + self.count]
+        self._keys = view[end + self.count:]
+        self._base = length + 1
+
+    def find(self, counts, blank):
+        """
+        Index of the state with counts[line][goal line] tiles and the
+        blank in line blank
+        Returns an integer
+        """
+        lines = self.lines
+        key = blank
+        for line in range(lines - 1, -1, -1):
+            for goal_line in range(lines - 1, -1, -1):
+                key = key * self._base + counts[line][goal_line]
+        wanted = key.to_bytes(self._width, "big")
+        width = self._width
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self._keys[middle * width:(middle + 1) * width]) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if (low == self.count or
+                bytes(self._keys[low * width:(low + 1) * width]) != wanted):
+            raise ValueError("state is not reachable in a %dx%d line "
+                             "abstraction" % (lines, self.length))
+        return low
+
+
+class WalkingDistanceHeuristic:
+    """
+    Walking distance: vertical moves needed by the row abstraction
+    plus horizontal moves needed by the column abstraction, read from
+    BFS tables. Works for any rectangular board; an axis whose
+    abstraction has more than MAX_WALKING_STATES states uses the
+    Manhattan distance along that axis instead
+    Follows the heuristic protocol from heuristics.py; a move follows
+    one link in one table, so updates are constant time
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, directory=None):
+        """
+        Load (or build) the row and column tables for the board shape
+        """
+        self._args = (puzzle_height, puzzle_width, directory)
+        self._height = puzzle_height
+        self._width = puzzle_width
+        self._rows = self._table(puzzle_height, puzzle_width, directory)
+        self._cols = self._table(puzzle_width, puzzle_height, directory)
+        self._row_state = self._col_state = 0
+        self._row_part = self._col_part = 0
+
+    def __reduce__(self):
+        """
+        Pickle as the constructor arguments: memory maps cannot be
+        pickled, so a copy in another process maps the files again
+        """
+        return self.__class__, self._args
+
+    @staticmethod
+    def _table(lines, length, directory):
+        """
+        WalkingTable for an axis, or None if it would be too large
+        """
+        if not has_walking_table(lines, length, directory):
+            return None
+        return WalkingTable(lines, length, directory)
+
+    def _axis(self, table, cells, by_row):
+        """
+        State index of one axis in its table, or the Manhattan
+        distance along the axis when it has no table
+        Returns an integer
+        """
+        part = 0 if by_row else 1
+        width = self._width
+        if table is None:
+            return sum(abs(divmod(pos, width)[part] - divmod(tile, width)[part])
+                       for pos, tile in enumerate(cells) if tile)
+        counts = [[0] * table.lines for _ in range(table.lines)]
+        blank = 0
+        for pos, tile in enumerate(cells):
+            if tile:
+                counts[divmod(pos, width)[part]][divmod(tile, width)[part]] += 1
+            else:
+                blank = divmod(pos, width)[part]
+        return table.find(counts, blank)
+
+    def reset(self, cells):
+        """
+        Evaluate a whole board
+        Returns an integer
+        """
+        self._row_state = self._axis(self._rows, cells, True)
+        self._col_state = self._axis(self._cols, cells, False)
+        self._row_part = (self._rows.dist[self._row_state]
+                          if self._rows is not None else self._row_state)
+        self._col_part = (self._cols.dist[self._col_state]
+                          if self._cols is not None else self._col_state)
+        return self._row_part + self._col_part
+
+    def move(self, cells, tile, src, dst):
+        """
+        Update the estimate after tile slid from src to dst (the
+        blank went from dst to src)
+        Returns an integer
+        """
+        width = self._width
+        if src % width == dst % width:
+            table = self._rows
+            if table is None:
+                self._row_part += (abs(dst // width - tile // width) -
+                                   abs(src // width - tile // width))
+            else:
+                side = int(src > dst)
+                self._row_state = table.links[
+                    (2 * self._row_state + side) * table.lines +
+                    tile // width]
+                self._row_part = table.dist[self._row_state]
+        else:
+            table = self._cols
+            if table is None:
+                self._col_part += (abs(dst % width - tile % width) -
+                                   abs(src % width - tile % width))
+            else:
+                side = int(src > dst)
+                self._col_state = table.links[
+                    (2 * self._col_state + side) * table.lines +
+                    tile % width]
+                self._col_part = table.dist[self._col_state]
+        return self._row_part + self._col_part
+
+
+def database_heuristic(puzzle_height, puzzle_width, directory=None):
+    """
+    Pick the strongest database heuristic available for a board shape:
+    the full table up to nine cells, the additive pattern databases on
+    4x4 and walking distance on other rectangles with a table for
+    at least one axis
+    Returns a heuristic object, or None if the shape has no database
+    """
+    if puzzle_height * puzzle_width <= MAX_FULL_TABLE_CELLS:
+        return FullTableHeuristic(puzzle_height, puzzle_width, directory)
+    if (puzzle_height, puzzle_width) == (4, 4):
+        return PatternDatabaseHeuristic(puzzle_height, puzzle_width,
+                                        directory=directory)
+    if (has_walking_table(puzzle_height, puzzle_width, directory) or
+            has_walking_table(puzzle_width, puzzle_height, directory)):
+        return WalkingDistanceHeuristic(puzzle_height, puzzle_width,
+                                        directory)
+    return None
@@ -2,6 +2,8 @@
 GUI for the Fifteen puzzle
 """
 
+import itertools
+
 import simplegui
 
 # constants
@@ -24,7 +26,7 @@ class FifteenGUI:
         self._frame = simplegui.create_frame("The Fifteen puzzle",
                                              self._puzzle_width * TILE_SIZE,
                                              self._puzzle_height * TILE_SIZE)
-        self._solution = ""
+        self._solution = iter("")
         self._current_moves = ""
         self._frame.add_button("Solve", self.solve, 100)
         self._frame.add_input("Enter moves", self.enter_moves, 100)
@@ -39,10 +41,9 @@ class FifteenGUI:
         """
         Timer for incrementally displaying computed solution
         """
-        if self._solution == "":
+        direction = next(self._solution, None)
+        if direction is None:
             return
-        direction = self._solution[0]
-        self._solution = self._solution[1:]
         try:
             self._puzzle.update_puzzle(direction)
         except:
@@ -53,7 +54,7 @@ class FifteenGUI:
         Event handler to generate solution string for given configuration
         """
         new_puzzle = self._puzzle.clone()
-        self._solution = new_puzzle.solve_puzzle()
+        self._solution = itertools.chain.from_iterable(new_puzzle.iter_solve())
 
     def print_moves(self):
         """
@@ -66,7 +67,7 @@ class FifteenGUI:
         """
         Event handler to enter move string
         """
-        self._solution = txt
+        self._solution = iter(txt)
 
     def keydown(self, key):
         """
@@ -0,0 +1,353 @@
+"""
+Asynchronous HTTP/JSON solving service for the Fifteen puzzle
+
+    python service.py --port 8015 --workers 4
+
+POST /solve with a JSON body {"grid": [[...], ...], "mode": "fast"}
+(mode is one of batch.MODES, "fast" by default). Requests that arrive
+together are grouped into micro-batches of up to --max-batch boards,
+waiting at most --max-delay seconds for a batch to fill, and every
+batch is solved in one call to a process pool. The answer is streamed
+back with chunked transfer encoding as JSON lines:
+
+    {"moves": "<at most CHUNK moves>"}      one or more lines
+    {"done": true, "length": 1234, "batch": 8}
+
+Only a bounded number of requests may wait for a batch: once that
+queue is full new requests get 503 with a Retry-After header instead
+of piling up. GET /health reports the queue depth and counters
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from batch import MODES, solve_grid
+
+CHUNK = 1 << 16
+MAX_BODY = 1 << 22
+
+
+def _solve_batch(jobs):
+    """
+    Pool entry point for a list of (grid, mode) jobs
+    Returns a list of (move string or None, error message or None)
+    """
+    results = []
+    for grid, mode in jobs:
+        try:
+            results.append((solve_grid(grid, mode), None))
+        except Exception as error:
+            # One bad board must not fail the other requests of its batch
+            results.append((None, str(error)))
+    return results
+
+
+def parse_job(body):
+    """
+    Validate a request body
+    Raises ValueError with a message for the client
+    Returns (grid, mode)
+    """
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise ValueError("body is not valid JSON")
+    if not isinstance(request, dict):
+        raise ValueError("body must be a JSON object")
+    grid = request.get("grid")
+    mode = request.get("mode", "fast")
+    if mode not in MODES:
+        raise ValueError("unknown mode: " + str(mode))
+    if (not isinstance(grid, list) or len(grid) < 2 or
+            not all(isinstance(row, list) for row in grid)):
+        raise ValueError("grid must be a list of at least two rows")
+    width = len(grid[0])
+    if width < 2 or any(len(row) != width for row in grid):
+        raise ValueError("grid rows must share a width of at least two")
+    if not all(isinstance(value, int) for row in grid for value in row):
+        raise ValueError("grid values must be integers")
+    size = len(grid) * width
+    if not all(0 <= value < size for row in grid for value in row):
+        raise ValueError("grid values must lie in 0..%d" % (size - 1))
+    return grid, mode
+
+
+class SolveService:
+    """
+    Micro-batching front end of a process pool
+    """
+
+    def __init__(self, workers=None, max_batch=32, max_delay=0.005,
+                 queue_size=1024):
+        """
+        workers sizes the process pool, max_batch and max_delay bound
+        a batch in boards and seconds and queue_size is the number of
+        requests that may wait before new ones are refused
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # Forked workers would inherit the client sockets open when
+        # they start and keep those connections from ever closing
+        context = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=context)
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        # Two batches per worker in flight keeps the pool busy while
+        # leaving overload to back up into the bounded queue
+        self._slots = asyncio.Semaphore(2 * workers)
+        self._batcher = None
+        self.batches = 0
+        self.solved = 0
+        self.rejected = 0
+
+    def start(self):
+        """
+        Start grouping queued requests into batches
+        """
+        self._batcher = asyncio.get_running_loop().create_task(self._collect())
+
+    async def close(self):
+        """
+        Stop batching and shut the process pool down
+        """
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def health(self):
+        """
+        Queue depth and counters
+        Returns a dict
+        """
+        return {"queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "batches": self.batches,
+                "solved": self.solved,
+                "rejected": self.rejected}
+
+    def submit(self, grid, mode):
+        """
+        Queue one board without waiting
+        Returns a future resolving to (moves, error, batch size), or
+        None when the queue is full
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((grid, mode, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+        return future
+
+    async def _collect(self):
+        """
+        Form batches: the first waiting request opens a batch that
+        closes when full or max_delay seconds later
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_delay
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),
+                                                        timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        """
+        Solve one batch in the pool and resolve its futures
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _solve_batch,
+                [(grid, mode) for grid, mode, _ in batch])
+        except Exception as error:
+            results = [(None, "solver failed: %s" % error)] * len(batch)
+        finally:
+            self._slots.release()
+        self.batches += 1
+        for (_, _, future), (moves, error) in zip(batch, results):
+            if moves is not None:
+                self.solved += 1
+            if not future.cancelled():
+                future.set_result((moves, error, len(batch)))
+
+
+async def _read_request(reader):
+    """
+    Read one HTTP/1.1 request
+    Returns (method, path, body), or None if the client sent nothing
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    if length > MAX_BODY:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def _head(status, content_type, extra=()):
+    """
+    Status line and headers of a response
+    Returns bytes
+    """
+    lines = ["HTTP/1.1 %d %s" % (status, status.phrase),
+             "Content-Type: " + content_type,
+             "Connection: close"]
+    lines.extend(extra)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _json_response(writer, status, payload, extra=()):
+    """
+    Write a complete JSON response
+    """
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(_head(status, "application/json",
+                       ["Content-Length: %d" % len(body)] + list(extra)))
+    writer.write(body)
+
+
+async def _stream_moves(writer, moves, batch_size):
+    """
+    Stream a solution as chunked JSON lines, draining between chunks
+    """
+    writer.write(_head(HTTPStatus.OK, "application/x-ndjson",
+                       ["Transfer-Encoding: chunked"]))
+    lines = [json.dumps({"moves": moves[start:start + CHUNK]})
+             for start in range(0, len(moves), CHUNK)]
+    lines.append(json.dumps({"done": True, "length": len(moves),
+                             "batch": batch_size}))
+    for line in lines:
+        data = (line + "\n").encode("ascii")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+
+
+def handler(service):
+    """
+    Connection callback for asyncio.start_server
+    Returns a coroutine function
+    """
+    async def handle(reader, writer):
+        try:
+            try:
+                request = await _read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError) as error:
+                _json_response(writer, HTTPStatus.BAD_REQUEST,
+                               {"error": str(error) or "bad request"})
+                return
+            if request is None:
+                return
+            method, path, body = request
+            if path == "/health" and method == "GET":
+                _json_response(writer, HTTPStatus.OK, service.health())
+            elif path != "/solve":
+                _json_response(writer, HTTPStatus.NOT_FOUND,
+                               {"error": "unknown path: " + path})
+            elif method != "POST":
+                _json_response(writer, HTTPStatus.METHOD_NOT_ALLOWED,
+                               {"error": "use POST"}, ["Allow: POST"])
+            else:
+                try:
+                    grid, mode = parse_job(body)
+                except ValueError as error:
+                    _json_response(writer, HTTPStatus.BAD_REQUEST,
+                                   {"error": str(error)})
+                    return
+                future = service.submit(grid, mode)
+                if future is None:
+                    _json_response(writer, HTTPStatus.SERVICE_UNAVAILABLE,
+                                   {"error": "queue full"},
+                                   ["Retry-After: 1"])
+                    return
+                moves, error, batch_size = await future
+                if moves is None:
+                    _json_response(writer, HTTPStatus.UNPROCESSABLE_ENTITY,
+                                   {"error": error})
+                else:
+                    await _stream_moves(writer, moves, batch_size)
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    return handle
+
+
+async def serve(host="127.0.0.1", port=8015, workers=None, max_batch=32,
+                max_delay=0.005, queue_size=1024):
+    """
+    Run the service until cancelled
+    """
+    service = SolveService(workers, max_batch, max_delay, queue_size)
+    service.start()
+    server = await asyncio.start_server(handler(service), host, port,
+                                        backlog=queue_size)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Returns a process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve Fifteen puzzle solutions over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8015)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-delay", type=float, default=0.005,
+                        help="seconds a batch waits to fill up")
+    parser.add_argument("--queue-size", type=int, default=1024,
+                        help="waiting requests before answering 503")
+    args = parser.parse_args(argv)
+    sys.stderr.write("serving on http://%s:%d\n" % (args.host, args.port))
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_batch,
+                          args.max_delay, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
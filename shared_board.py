@@ -0,0 +1,214 @@
+"""
+Fifteen puzzle boards in shared memory with an in-place move applier
+
+A SharedBoard keeps its shape, blank position and cells in one
+multiprocessing.shared_memory block, so other processes attach to it
+by name and replay or validate move strings directly on the buffer
+instead of pickling grids back and forth. Moves are applied through a
+precomputed (blank position, direction) -> new blank position table
+and a byte lookup, so a move stream of any length is checked without
+allocating per move
+
+Layout of the block: three uint32 header fields (height, width,
+blank), one padding field, then the cells row by row
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+HEADER = 16
+
+# ASCII code of a direction -> move code (u, d, l, r), -1 otherwise
+_CODE_OF_BYTE = array('b', [-1]) * 256
+for _code, _direction in enumerate(b"udlr"):
+    _CODE_OF_BYTE[_direction] = _code
+
+_STEP_TABLES = {}
+
+
+def step_table(puzzle_height, puzzle_width):
+    """
+    New blank position for every (blank position, move code) pair
+    flattened as blank * 4 + code, or -1 where the move leaves the grid
+    Returns an array of integers
+    """
+    shape = (puzzle_height, puzzle_width)
+    table = _STEP_TABLES.get(shape)
+    if table is None:
+        table = array('i', [-1]) * (4 * puzzle_height * puzzle_width)
+        for pos in range(puzzle_height * puzzle_width):
+            row, col = divmod(pos, puzzle_width)
+            if row > 0:
+                table[4 * pos] = pos - puzzle_width
+            if row < puzzle_height - 1:
+                table[4 * pos + 1] = pos + puzzle_width
+            if col > 0:
+                table[4 * pos + 2] = pos - 1
+            if col < puzzle_width - 1:
+                table[4 * pos + 3] = pos + 1
+        _STEP_TABLES[shape] = table
+    return table
+
+
+def apply_moves(cells, blank, moves, table):
+    """
+    Apply a move stream (str or ASCII bytes) in place on a flat
+    writable buffer of cells with the blank at position blank
+    Returns (blank, number of moves applied, True if all were legal)
+    """
+    if isinstance(moves, str):
+        moves = moves.encode("ascii")
+    codes = _CODE_OF_BYTE
+    applied = 0
+    for byte in moves:
+        code = codes[byte]
+        target = table[4 * blank + code] if code >= 0 else -1
+        if target < 0:
+            return blank, applied, False
+        cells[blank] = cells[target]
+        cells[target] = 0
+        blank = target
+        applied += 1
+    return blank, applied, True
+
+
+def is_solved(cells):
+    """
+    Check that every cell holds its own index
+    Returns a boolean
+    """
+    for pos in range(len(cells)):
+        if cells[pos] != pos:
+            return False
+    return True
+
+
+class SharedBoard:
+    """
+    One board stored in a named shared memory block
+    """
+
+    def __init__(self, memory, owner):
+        """
+        Wrap an existing block; use create or attach instead
+        """
+        self._memory = memory
+        self._owner = owner
+        self._header = memory.buf[:HEADER].cast('I')
+        self.height = self._header[0]
+        self.width = self._header[1]
+        self.cells = memory.buf[HEADER:HEADER + 4 * self.height * self.width].cast('I')
+        self._table = step_table(self.height, self.width)
+
+    @classmethod
+    def create(cls, grid):
+        """
+        Copy a board given as a list of rows into a new block
+        Returns a SharedBoard
+        """
+        height, width = len(grid), len(grid[0])
+        memory = shared_memory.SharedMemory(create=True,
+                                            size=HEADER + 4 * height * width)
+        flat = array('I', [value for row in grid for value in row])
+        header = array('I', [height, width, flat.index(0), 0])
+        memory.buf[:HEADER] = header.tobytes()
+        memory.buf[HEADER:HEADER + 4 * len(flat)] = flat.tobytes()
+        return cls(memory, True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a block created by another process
+        Returns a SharedBoard
+        """
+        return cls(shared_memory.SharedMemory(name=name), False)
+
+    @property
+    def name(self):
+        """
+        Name other processes use to attach
+        Returns a string
+        """
+        return self._memory.name
+
+    def get_blank(self):
+        """
+        Flat position of the blank
+        Returns an integer
+        """
+        return self._header[2]
+
+    def get_number(self, row, col):
+        """
+        Getter for the number at tile position pos
+        Returns an integer
+        """
+        return self.cells[col + self.width * row]
+
+    def grid(self):
+        """
+        Copy of the board as a list of rows
+        Returns a list of lists
+        """
+        flat = self.cells.tolist()
+        return [flat[row * self.width:(row + 1) * self.width]
+                for row in range(self.height)]
+
+    def apply(self, moves):
+        """
+        Apply moves in place on the shared buffer, stopping at the
+        first illegal move
+        Returns (number of moves applied, True if all were legal)
+        """
+        blank, applied, legal = apply_moves(self.cells, self._header[2],
+                                            moves, self._table)
+        self._header[2] = blank
+        return applied, legal
+
+    def verify(self, moves, in_place=False):
+        """
+        Check that moves solve the board; without in_place the moves
+        run on one private copy of the cells and the board is left as is
+        Returns a boolean
+        """
+        if in_place:
+            _, legal = self.apply(moves)
+            return legal and is_solved(self.cells)
+        cells = array('I', self.cells)
+        _, _, legal = apply_moves(cells, self._header[2], moves, self._table)
+        return legal and is_solved(cells)
+
+    def close(self):
+        """
+        Release this process's view; the creator also frees the block
+        """
+        self._header.release()
+        self.cells.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+
+def validate_in_place(name, moves):
+    """
+    Worker entry point: attach to a shared board by name, apply the
+    moves on it in place and check that it ends up solved
+    Returns a boolean
+    """
+    board = SharedBoard.attach(name)
+    try:
+        return board.verify(moves, in_place=True)
+    finally:
+        board.close()
+
+
+def validate_many(boards, solutions, workers=None):
+    """
+    Validate solutions for shared boards across a process pool; only
+    block names and move strings cross process boundaries
+    Returns a list of booleans in input order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(validate_in_place,
+                                 [board.name for board in boards], solutions))
@@ -0,0 +1,154 @@
+"""
+Exact (shortest) solutions for small Fifteen puzzle boards such as
+3x3 and 2xN
+
+Two strategies are offered:
+    bidirectional_solve  breadth-first search from the board and from
+                         the solved board (blank in the upper left) at
+                         the same time, over boards packed into
+                         integers and kept in hash maps
+    table_solve          greedy walk down the full distance table of
+                         pattern_db (181,440 states for 3x3), built once
+                         and memory-mapped, so a query only looks at the
+                         neighbours of each board on the way
+"""
+
+import pattern_db
+from optimal import DIRECTIONS, neighbor_table
+
+
+def _pack(cells, bits):
+    """
+    Pack a flat board into an integer, first cell in the lowest bits
+    Returns an integer
+    """
+    state = 0
+    for pos in range(len(cells) - 1, -1, -1):
+        state = (state << bits) | cells[pos]
+    return state
+
+
+def _expand(layer, seen, other, neighbors, bits, mask):
+    """
+    Expand one complete breadth-first layer of one search direction
+    Returns the next layer and the states where the two searches met
+    """
+    next_layer = []
+    meetings = []
+    for state, blank in layer:
+        for code, target in neighbors[blank]:
+            tile = (state >> target * bits) & mask
+            moved = state + (tile << blank * bits) - (tile << target * bits)
+            if moved in seen:
+                continue
+            seen[moved] = (state, code)
+            next_layer.append((moved, target))
+            if moved in other:
+                meetings.append(moved)
+    return next_layer, meetings
+
+
+def _path(seen, state):
+    """
+    Walk parent links back to the root of one search
+    Returns the list of move codes from the root to state
+    """
+    codes = []
+    while True:
+        parent, code = seen[state]
+        if parent is None:
+            break
+        codes.append(code)
+        state = parent
+    codes.reverse()
+    return codes
+
+
+def bidirectional_solve(cells, puzzle_height, puzzle_width):
+    """
+    Shortest solution of a flat board by bidirectional breadth-first
+    search
+    Returns a move string, or None if the board cannot be solved
+    """
+    size = puzzle_height * puzzle_width
+    bits = max(1, (size - 1).bit_length())
+    mask = (1 << bits) - 1
+    neighbors = neighbor_table(puzzle_height, puzzle_width)
+
+    start = _pack(cells, bits)
+    goal = _pack(range(size), bits)
+    if start == goal:
+        return ""
+    forward = {start: (None, None)}
+    backward = {goal: (None, None)}
+    forward_layer = [(start, list(cells).index(0))]
+    backward_layer = [(goal, 0)]
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meetings = _expand(forward_layer, forward, backward,
+                                              neighbors, bits, mask)
+        else:
+            backward_layer, meetings = _expand(backward_layer, backward,
+                                               forward, neighbors, bits, mask)
+        if meetings:
+            best = min(meetings, key=lambda state: len(_path(forward, state)) +
+                       len(_path(backward, state)))
+            # The backward half is undone in reverse with opposite moves
+            codes = (_path(forward, best) +
+                     [code ^ 1 for code in reversed(_path(backward, best))])
+            return "".join(DIRECTIONS[code] for code in codes)
+    return None
+
+
+def table_solve(cells, puzzle_height, puzzle_width, directory=None):
+    """
+    Shortest solution of a flat board of at most nine cells, stepping
+    to a neighbour one move closer according to the full distance table
+    Raises ValueError for larger boards
+    Returns a move string, or None if the board cannot be solved
+    """
+    if puzzle_height * puzzle_width > pattern_db.MAX_FULL_TABLE_CELLS:
+        raise ValueError("full distance tables stop at %d cells, not %dx%d"
+                         % (pattern_db.MAX_FULL_TABLE_CELLS, puzzle_height,
+                            puzzle_width))
+    table = pattern_db.load_full_table(puzzle_height, puzzle_width, directory)
+    neighbors = neighbor_table(puzzle_height, puzzle_width)
+    cells = list(cells)
+    blank = cells.index(0)
+    distance = table[pattern_db.permutation_rank(cells)]
+    if distance == pattern_db.UNKNOWN:
+        return None
+    moves = []
+    while distance:
+        for code, target in neighbors[blank]:
+            cells[blank], cells[target] = cells[target], 0
+            if table[pattern_db.permutation_rank(cells)] == distance - 1:
+                break
+            cells[target], cells[blank] = cells[blank], 0
+        moves.append(DIRECTIONS[code])
+        blank = target
+        distance -= 1
+    return "".join(moves)
+
+
+def solve_exact(puzzle, use_table=False, directory=None):
+    """
+    Generate a shortest solution string for a small puzzle, by table
+    walk when use_table is set (boards of up to nine cells) and by
+    bidirectional search otherwise
+    Raises ValueError for unsolvable boards and for use_table on
+    boards of more than nine cells
+    Updates the puzzle and returns a move string
+    """
+    if not puzzle.is_solvable():
+        raise ValueError("unsolvable board:\n" + str(puzzle))
+    height, width = puzzle.get_height(), puzzle.get_width()
+    cells = [puzzle.get_number(row, col)
+             for row in range(height) for col in range(width)]
+    if use_table:
+        moves = table_solve(cells, height, width, directory)
+    else:
+        moves = bidirectional_solve(cells, height, width)
+    puzzle.update_puzzle(moves)
+    return moves
@@ -0,0 +1,205 @@
+"""
+Solution cache for the Fifteen puzzle keyed by canonical board encodings
+
+Boards are keyed compactly: 4x4 boards pack into one 64-bit integer
+(four bits per cell), larger boards use a 16 byte BLAKE2 digest of the
+shape and cells. Square boards are first canonicalized under the
+transpose, which maps the solved board (blank in the upper left) onto
+itself: a solution for the transposed board becomes a solution for
+the original by swapping u with l and d with r, so a board and its
+mirror image share one entry.
+
+Entries live in an in-memory LRU and optionally in a persistent dbm
+file where move strings are stored with move_codec
+"""
+
+import dbm
+import hashlib
+import sys
+from array import array
+from collections import OrderedDict
+
+import move_codec
+from solver import Puzzle
+
+# Moves on the transposed board expressed on the original one
+TRANSPOSE_MOVES = str.maketrans("udlr", "lrud")
+
+
+def board_key(cells, puzzle_height, puzzle_width):
+    """
+    Compact key for a flat board: a 64-bit integer for 4x4 boards,
+    otherwise a digest of the shape and cells
+    Returns an integer or a bytes object
+    """
+    if puzzle_height == 4 and puzzle_width == 4:
+        key = 0
+        for value in cells:
+            key = (key << 4) | value
+        return key
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(b"%dx%d:" % (puzzle_height, puzzle_width))
+    digest.update(array("I", cells).tobytes())
+    return digest.digest()
+
+
+def transpose(cells, size):
+    """
+    Mirror a flat square board across its main diagonal, relabelling
+    every tile with its mirrored solved cell
+    Returns a list
+    """
+    mirrored = [0] * (size * size)
+    for pos, value in enumerate(cells):
+        row, col = divmod(pos, size)
+        value_row, value_col = divmod(value, size)
+        mirrored[col * size + row] = value_col * size + value_row
+    return mirrored
+
+
+def canonical(cells, puzzle_height, puzzle_width):
+    """
+    Pick the canonical member of a board's symmetry class
+    Returns (key, canonical cells, True if the board was transposed)
+    """
+    cells = list(cells)
+    key = board_key(cells, puzzle_height, puzzle_width)
+    if puzzle_height != puzzle_width:
+        return key, cells, False
+    mirrored = transpose(cells, puzzle_width)
+    mirrored_key = board_key(mirrored, puzzle_height, puzzle_width)
+    if mirrored_key < key:
+        return mirrored_key, mirrored, True
+    return key, cells, False
+
+
+def _disk_key(key):
+    """
+    Byte form of a key for the persistent tier
+    Returns a bytes object
+    """
+    if isinstance(key, int):
+        return key.to_bytes(8, "big")
+    return key
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions with an optional persistent tier
+    """
+
+    def __init__(self, capacity=100000, path=None, solve=None):
+        """
+        capacity bounds the in-memory entries, path names a dbm file
+        for the persistent tier and solve(puzzle) produces a solution
+        on a miss (Puzzle.solve_puzzle by default)
+        """
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._disk = dbm.open(path, "c") if path is not None else None
+        self._solve = solve if solve is not None else Puzzle.solve_puzzle
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = 0
+
+    def _remember(self, key, moves):
+        """
+        Insert an entry at the most recent end, evicting if needed
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = moves
+        self.memory += sys.getsizeof(key) + sys.getsizeof(moves)
+        while len(self._entries) > self._capacity:
+            old_key, old_moves = self._entries.popitem(last=False)
+            self.memory -= sys.getsizeof(old_key) + sys.getsizeof(old_moves)
+            self.evictions += 1
+
+    def _lookup(self, key):
+        """
+        Find a canonical solution in memory, then on disk, counting
+        the hit or miss
+        Returns a move string or None
+        """
+        moves = self._entries.get(key)
+        if moves is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return moves
+        if self._disk is not None:
+            stored = self._disk.get(_disk_key(key))
+            if stored is not None:
+                moves = move_codec.decode(stored)
+                self._remember(key, moves)
+                self.disk_hits += 1
+                return moves
+        self.misses += 1
+        return None
+
+    def get(self, cells, puzzle_height, puzzle_width):
+        """
+        Look up a solution for a flat board
+        Returns a move string or None
+        """
+        key, _, mirrored = canonical(cells, puzzle_height, puzzle_width)
+        moves = self._lookup(key)
+        if moves is not None and mirrored:
+            moves = moves.translate(TRANSPOSE_MOVES)
+        return moves
+
+    def solve(self, puzzle):
+        """
+        Solve a puzzle through the cache, solving its canonical board
+        on a miss
+        Updates the puzzle and returns a move string
+        """
+        height, width = puzzle.get_height(), puzzle.get_width()
+        cells = [puzzle.get_number(row, col)
+                 for row in range(height) for col in range(width)]
+        key, canonical_cells, mirrored = canonical(cells, height, width)
+        moves = self._lookup(key)
+        if moves is None:
+            board = Puzzle(height, width,
+                           [canonical_cells[row * width:(row + 1) * width]
+                            for row in range(height)])
+            moves = self._solve(board)
+            self._remember(key, moves)
+            if self._disk is not None:
+                self._disk[_disk_key(key)] = move_codec.encode(moves)
+        if mirrored:
+            moves = moves.translate(TRANSPOSE_MOVES)
+        puzzle.update_puzzle(moves)
+        return moves
+
+    def hit_rate(self):
+        """
+        Fraction of lookups served from memory or disk
+        Returns a float
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / float(lookups) if lookups else 0.0
+
+    def stats(self):
+        """
+        Counters describing cache effectiveness and size
+        Returns a dict
+        """
+        return {"entries": len(self._entries),
+                "capacity": self._capacity,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hit_rate(),
+                "memory_bytes": self.memory}
+
+    def close(self):
+        """
+        Flush and close the persistent tier
+        """
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
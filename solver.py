@@ -2,30 +2,83 @@
 Loyd's Fifteen puzzle - solver and visualizer
 Note that solved configuration has the blank (zero) tile in upper left
 Use the arrows key to swap this tile with its neighbors
+
+Importing this module is headless and side-effect free; the GUI
+(poc_fifteen_gui, which needs simplegui) is only imported and started
+when the module is run as a script
 """
 
-import poc_fifteen_gui
+from array import array
+
+import large_board
+import move_codec
+import optimal
+
+# Phase invariant checking: never, on every SAMPLE_INTERVAL-th check,
+# or on every check backed by incremental solved-tile counters
+VERIFY_MODES = ("off", "sampled", "full")
+SAMPLE_INTERVAL = 16
+
+
+def _typecode(size):
+    """
+    Pick the smallest unsigned array typecode that can hold
+    the values 0..size (size itself is used as a sentinel)
+    Returns a string
+    """
+    if size < 1 << 8:
+        return 'B'
+    if size < 1 << 16:
+        return 'H'
+    return 'I'
+
 
 class Puzzle:
     """
     Class representation for the Fifteen puzzle
     """
 
-    def __init__(self, puzzle_height, puzzle_width, initial_grid=None):
+    # The board lives in one flat row-major buffer (_cells) together with
+    # its inverse (_index: tile value -> flat cell), no per-instance dict
+    __slots__ = ('_height', '_width', '_cells', '_index',
+                 '_verify', '_checks', '_row_solved')
+
+    def __init__(self, puzzle_height, puzzle_width, initial_grid=None,
+                 verify="off"):
         """
         Initialize puzzle with default height and width
+        verify selects how phase invariants are checked, see set_verify
         Returns a Puzzle object
         """
         self._height = puzzle_height
         self._width = puzzle_width
-        self._grid = [[col + puzzle_width * row
-                       for col in range(self._width)]
-                      for row in range(self._height)]
+        size = puzzle_height * puzzle_width
+        typecode = _typecode(size)
+        if initial_grid is not None:
+            if (len(initial_grid) != puzzle_height or
+                    any(len(row) != puzzle_width for row in initial_grid)):
+                raise ValueError("grid is not " + str(puzzle_height) +
+                                 "x" + str(puzzle_width))
+            flat = [initial_grid[row][col]
+                    for row in range(puzzle_height)
+                    for col in range(puzzle_width)]
+            for value in flat:
+                if not 0 <= value < size:
+                    raise ValueError("grid is not a permutation of 0.." +
+                                     str(size - 1) + ": " + str(value) +
+                                     " is out of range")
+            self._cells = array(typecode, flat)
+        else:
+            self._cells = array(typecode, range(size))
+
+        # Inverse index: tile value -> flat position of its current cell;
+        # duplicates leave some entry at size for is_solvable to report
+        self._index = array(typecode, [size]) * size
+        for pos, value in enumerate(self._cells):
+            self._index[value] = pos
 
-        if initial_grid != None:
-            for row in range(puzzle_height):
-                for col in range(puzzle_width):
-                    self._grid[row][col] = initial_grid[row][col]
+        self._row_solved = None
+        self.set_verify(verify)
 
     def __str__(self):
         """
@@ -34,7 +87,8 @@ class Puzzle:
         """
         ans = ""
         for row in range(self._height):
-            ans += str(self._grid[row])
+            start = row * self._width
+            ans += str(self._cells[start:start + self._width].tolist())
             ans += "\n"
         return ans
 
@@ -60,22 +114,94 @@ class Puzzle:
         Getter for the number at tile position pos
         Returns an integer
         """
-        return self._grid[row][col]
+        return self._cells[col + self._width * row]
 
     def set_number(self, row, col, value):
         """
         Setter for the number at tile position pos
         """
-        self._grid[row][col] = value
+        pos = col + self._width * row
+        if self._row_solved is not None:
+            self._row_solved[row] += (value == pos) - (self._cells[pos] == pos)
+        self._cells[pos] = value
+        self._index[value] = pos
 
     def clone(self):
         """
         Make a copy of the puzzle to update during solving
         Returns a Puzzle object
         """
-        new_puzzle = Puzzle(self._height, self._width, self._grid)
+        new_puzzle = Puzzle.__new__(Puzzle)
+        new_puzzle._height = self._height
+        new_puzzle._width = self._width
+        new_puzzle._cells = self._cells[:]
+        new_puzzle._index = self._index[:]
+        new_puzzle._verify = self._verify
+        new_puzzle._checks = 0
+        new_puzzle._row_solved = None
+        if self._row_solved is not None:
+            new_puzzle._row_solved = self._row_solved[:]
         return new_puzzle
 
+    def get_verify(self):
+        """
+        Getter for the verify mode, see set_verify
+        Returns a string
+        """
+        return self._verify
+
+    def set_verify(self, mode):
+        """
+        Choose how the phase methods check their invariants:
+        "off" skips them, "sampled" evaluates one check in every
+        SAMPLE_INTERVAL and "full" evaluates all of them, keeping a
+        count of solved tiles per row up to date on every move so a
+        check costs O(height + width) instead of a board rescan
+        """
+        if mode not in VERIFY_MODES:
+            raise ValueError("unknown verify mode: " + str(mode))
+        self._verify = mode
+        self._checks = 0
+        if mode != "full":
+            self._row_solved = None
+        elif self._row_solved is None:
+            width = self._width
+            cells = self._cells
+            self._row_solved = array('I', [
+                sum(1 for pos in range(row * width, (row + 1) * width)
+                    if cells[pos] == pos)
+                for row in range(self._height)])
+
+    def _checked(self, invariant, *args):
+        """
+        Evaluate a phase invariant according to the verification mode
+        Returns a boolean, True when the check is skipped
+        """
+        if self._verify == "off":
+            return True
+        if self._verify == "sampled":
+            self._checks += 1
+            if self._checks % SAMPLE_INTERVAL:
+                return True
+        return invariant(*args)
+
+    def _rows_solved(self, first_row):
+        """
+        Check that every tile from first_row down is in its solved place
+        Returns a boolean
+        """
+        if self._row_solved is not None:
+            width = self._width
+            for row in range(first_row, self._height):
+                if self._row_solved[row] != width:
+                    return False
+            return True
+        for row in range(first_row, self.get_height()):
+            for col in range(self.get_width()):
+                if self.current_position(row, col) != (row, col):
+                    return False
+        return True
+
     ########################################################
     # Core puzzle methods
 
@@ -86,42 +212,141 @@ class Puzzle:
         Returns a tuple of two integers        
         """
         solved_value = (solved_col + self._width * solved_row)
-
-        for row in range(self._height):
-            for col in range(self._width):
-                if self._grid[row][col] == solved_value:
-                    return (row, col)
-        assert False, "Value " + str(solved_value) + " not found"
+        pos = self._index[solved_value]
+        assert pos < len(self._cells), "Value " + str(solved_value) + " not found"
+        return divmod(pos, self._width)
 
     def update_puzzle(self, move_string):
         """
         Updates the puzzle state based on the provided move string
+        The moves may also be given as a buffer from move_codec.encode,
+        which is decoded block by block instead of expanded to a string
+        """
+        if isinstance(move_string, (bytes, bytearray, memoryview)):
+            move_string = move_codec.iter_moves(move_string)
+        if self._row_solved is not None:
+            self._update_counted(move_string)
+            return
+        cells = self._cells
+        index = self._index
+        width = self._width
+        zero = index[0]
+        try:
+            for direction in move_string:
+                if direction == "l":
+                    assert zero % width > 0, "move off grid: " + direction
+                    tile = cells[zero - 1]
+                    cells[zero] = tile
+                    index[tile] = zero
+                    zero -= 1
+                elif direction == "r":
+                    assert zero % width < width - 1, "move off grid: " + direction
+                    tile = cells[zero + 1]
+                    cells[zero] = tile
+                    index[tile] = zero
+                    zero += 1
+                elif direction == "u":
+                    assert zero >= width, "move off grid: " + direction
+                    tile = cells[zero - width]
+                    cells[zero] = tile
+                    index[tile] = zero
+                    zero -= width
+                elif direction == "d":
+                    assert zero < len(cells) - width, "move off grid: " + direction
+                    tile = cells[zero + width]
+                    cells[zero] = tile
+                    index[tile] = zero
+                    zero += width
+                else:
+                    assert False, "invalid direction: " + direction
+                cells[zero] = 0
+        finally:
+            # The blank's cached position is kept valid even on a bad move
+            index[0] = zero
+
+    def _update_counted(self, move_string):
+        """
+        update_puzzle variant that also maintains the per-row counts
+        of tiles in their solved position (verify mode "full")
+        """
+        cells = self._cells
+        index = self._index
+        counts = self._row_solved
+        width = self._width
+        size = len(cells)
+        zero = index[0]
+        try:
+            for direction in move_string:
+                if direction == "l":
+                    assert zero % width > 0, "move off grid: " + direction
+                    other = zero - 1
+                elif direction == "r":
+                    assert zero % width < width - 1, "move off grid: " + direction
+                    other = zero + 1
+                elif direction == "u":
+                    assert zero >= width, "move off grid: " + direction
+                    other = zero - width
+                elif direction == "d":
+                    assert zero < size - width, "move off grid: " + direction
+                    other = zero + width
+                else:
+                    assert False, "invalid direction: " + direction
+                tile = cells[other]
+                counts[zero // width] += (tile == zero) - (zero == 0)
+                counts[other // width] += (other == 0) - (tile == other)
+                cells[zero] = tile
+                index[tile] = zero
+                cells[other] = 0
+                zero = other
+        finally:
+            index[0] = zero
+
+    def is_solvable(self):
+        """
+        Check that the board can reach the solved configuration: the
+        parity of the permutation (inversions counted with a Fenwick
+        tree in O(n log n)) must match the parity of the blank's
+        distance from the upper left corner
+        Raises ValueError if the grid is not a permutation of 0..n-1
+        Returns a boolean
         """
-        zero_row, zero_col = self.current_position(0, 0)
-        for direction in move_string:
-            if direction == "l":
-                assert zero_col > 0, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row][zero_col - 1]
-                self._grid[zero_row][zero_col - 1] = 0
-                zero_col -= 1
-            elif direction == "r":
-                assert zero_col < self._width - 1, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row][zero_col + 1]
-                self._grid[zero_row][zero_col + 1] = 0
-                zero_col += 1
-            elif direction == "u":
-                assert zero_row > 0, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row - 1][zero_col]
-                self._grid[zero_row - 1][zero_col] = 0
-                zero_row -= 1
-            elif direction == "d":
-                assert zero_row < self._height - 1, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row + 1][zero_col]
-                self._grid[zero_row + 1][zero_col] = 0
-                zero_row += 1
-            else:
-                assert False, "invalid direction: " + direction
-                
+        cells = self._cells
+        index = self._index
+        size = len(cells)
+        for value in range(size):
+            pos = index[value]
+            if pos >= size or cells[pos] != value:
+                raise ValueError("grid is not a permutation of 0.." +
+                                 str(size - 1) + ": missing " + str(value))
+
+        if self._height == 1 or self._width == 1:
+            # Tiles can only shift along the line, never pass each other
+            tiles = [value for value in cells if value]
+            return tiles == sorted(tiles)
+
+        # Count inversions right to left: tree holds values seen so far
+        tree = [0] * (size + 1)
+        inversions = 0
+        for pos in range(size - 1, -1, -1):
+            node = cells[pos]
+            while node > 0:
+                inversions += tree[node]
+                node -= node & -node
+            node = cells[pos] + 1
+            while node <= size:
+                tree[node] += 1
+                node += node & -node
+        zero_row, zero_col = divmod(index[0], self._width)
+        return inversions % 2 == (zero_row + zero_col) % 2
+
+    def _require_solvable(self):
+        """
+        Reject boards that can never be solved before any work is done
+        """
+        if not self.is_solvable():
+            raise ValueError("unsolvable board (permutation parity does not "
+                             "match the blank position):\n" + str(self))
+
     ##################################################################
     # Helper function
     
@@ -130,64 +355,30 @@ class Puzzle:
         Moves the tile that is supposed to be at (num_row, num_col) 
         to the zero tile position and moves the zero tile to the left of it
         """
-        # Solution vars
-        sol = ''
-        temp = ''
-        
-        # Target 
-        target_pos = self.current_position(0, 0)
-        tile_pos = self.current_position(num_row, num_col)
-
-        # Return if tile is in the right position
-        if target_pos[0] == tile_pos[0] and target_pos[1] == tile_pos[1] - 1:
-            return sol
-        
-        # Calculate the difference between traget_pos and current_pos
-        diff_row = target_pos[0] - tile_pos[0]
-        diff_col = target_pos[1] - tile_pos[1]                
-            
-        # Position indices
-        right = int(diff_col < 0 and diff_row == 0)
-        left = int(diff_col > 0 and diff_row == 0)
-        up_tile = int(diff_col == 0 and diff_row > 0)
-        up_right = int(diff_col < 0 and diff_row > 1)
-        straight_up_right = int(diff_col < 0 and diff_row == 1 and tile_pos[0] != 0)
-        tight_up_right = int(diff_col < 0 and diff_row == 1 and tile_pos[0] == 0)
-        up_left = int(diff_col > 0 and diff_row > 1)
-        straight_up_left = int(diff_col > 0 and diff_row == 1 and tile_pos[0] != 0)
-        tight_up_left = int(diff_col > 0 and diff_row == 1 and tile_pos[0] == 0)
-        
-        # Move the zero tile to target tile
-        temp = 'u' * int(diff_row != 0) + 'l' * diff_col + 'r' * (-diff_col) + 'u' * (diff_row - 1) 
-        sol += temp
-        self.update_puzzle(temp)            
-
-        # Check if not to the UPPER LEFT of the zero tile and not in the first col
-        if not (self.current_position(num_row, num_col)[1] == 0 and diff_row > 0):
-            temp = (('lddru' * (diff_row - 1) + 'ld') * up_tile +					# Controls if tile is up
-                   ('urrdl' * (diff_col - 1)) * left +								# Controls if tile is left
-                   ('ulldr' * (-diff_col))[: -1] * right +							# Controls if tile is right
-                   ('ld' + ('rulld' * (-diff_col))[: -2] +
-                   ('lddru' * (diff_row))[: -3]) * up_right +						# Controls if tile is up right 
-                   (('ulldr' * (-diff_col))[: -1] + 'druld') * straight_up_right + 	# Controls if tile is up right by one row
-                   ('lddru' * (diff_row - 1) + 
-                   ('urrdl' * (diff_col))[2:]) * up_left + 							# Controls if tile is up left
-                   ('urrdl' * (diff_col - 1) + 'druld') * straight_up_left +		# Controls if tile is up left by one row
-                   (('dllur' * (-diff_col))[: -3] + 'uld') * tight_up_right +		# Controls if tile is up right by one row in the first row
-                   (('drrul' * (diff_col))[: -3] + 'uld') * tight_up_left)			# Controls if tile is up left by one row in the first row
-
-            sol += temp
-            self.update_puzzle(temp)
-            
-        # Controls if tile is to UPPER LEFT of the zero tile AND in the first coulmn
+        # Flat positions of the zero tile (target) and the tile
+        width = self._width
+        target_pos = self._index[0]
+        tile_pos = self._index[num_col + width * num_row]
+
+        # Calculate the difference between target_pos and tile_pos
+        diff_row = target_pos // width - tile_pos // width
+        diff_col = target_pos % width - tile_pos % width
+
+        # The placement for this relative position comes precompiled
+        # from large_board's table, keyed by whether the tile starts in
+        # the first row and lands in the first column
+        placement = large_board.placement_for(
+            diff_row, diff_col, tile_pos < width,
+            large_board.landing_column(diff_row, diff_col,
+                                       tile_pos % width) == 0,
+            width)
+        if self._row_solved is None:
+            placement.apply(self._cells, self._index, target_pos,
+                            self._height, width)
         else:
-            temp = ('rddlu' * (diff_row - 1) + 'rd'
-                    + 'lurrd' * (diff_col - 1) + 'l')
-
-            sol += temp
-            self.update_puzzle(temp)        
+            self.update_puzzle(placement.moves)
 
-        return sol
+        return placement.moves
     
     ##################################################################
     # Phase one methods
@@ -203,10 +394,8 @@ class Puzzle:
             return False
         
         # Check that all tiles in rows i+1 or below are positioned at their solved location.
-        for row in range(target_row + 1, self.get_height()):
-            for col in range(self.get_width()):
-                if self.current_position(row, col) != (row, col):
-                    return False
+        if not self._rows_solved(target_row + 1):
+            return False
             
         # Check that all tiles in row i to the right of position (i, j) are positioned at their solved location.
         for col in range(target_col + 1, self.get_width()):
@@ -224,7 +413,7 @@ class Puzzle:
         mov = ''
         
         # Check if the lower row invariant is true at the begining 
-        assert self.lower_row_invariant(target_row, target_col)
+        assert self._checked(self.lower_row_invariant, target_row, target_col)
         
         # Main logic
         mov = self.position_tile(target_row, target_col)
@@ -244,7 +433,7 @@ class Puzzle:
         temp = ''
         
         # Check if the lower row invariant is true at the begining 
-        assert self.lower_row_invariant(target_row, 0)
+        assert self._checked(self.lower_row_invariant, target_row, 0)
         
         # Main logic
         temp = 'ur'
@@ -274,7 +463,7 @@ class Puzzle:
             self.update_puzzle(temp)
             
         # Check if the lower row invariant is true at the end 
-        assert self.lower_row_invariant(target_row - 1, self.get_width() - 1)
+        assert self._checked(self.lower_row_invariant, target_row - 1, self.get_width() - 1)
 
         return mov
 
@@ -299,10 +488,8 @@ class Puzzle:
                         return False
              
         # Check for remaining rows
-        for row in range(2, self.get_height()):
-            for col in range(self.get_width()):
-                if self.current_position(row, col) != (row, col):
-                    return False        
+        if not self._rows_solved(2):
+            return False
         
         return True
 
@@ -333,7 +520,7 @@ class Puzzle:
         mov = ''
         
         # Check if the first row invariant is true at the beginning
-        assert self.row0_invariant(target_col)
+        assert self._checked(self.row0_invariant, target_col)
         
         # Move the zero tile to lower left position
         temp = 'ld'
@@ -351,7 +538,7 @@ class Puzzle:
             self.update_puzzle(temp)
         
         # Check if the second row invariant is true at the end 
-        assert self.row1_invariant(target_col - 1)
+        assert self._checked(self.row1_invariant, target_col - 1)
         
         return mov
 
@@ -365,7 +552,7 @@ class Puzzle:
         temp = ''
         
         # Check if the second row invariant is true at the begining 
-        assert self.row1_invariant(target_col)
+        assert self._checked(self.row1_invariant, target_col)
         
         # Main logic 
         mov += self.position_tile(1, target_col)
@@ -374,7 +561,7 @@ class Puzzle:
         self.update_puzzle(temp)
         
         # Check if the first row invariant is true at the end
-        assert self.row0_invariant(target_col)
+        assert self._checked(self.row0_invariant, target_col)
         
         return mov
 
@@ -402,7 +589,7 @@ class Puzzle:
         mov = ''
         
         # Check if second row invariant is True at the begging
-        assert self.row1_invariant(1)
+        assert self._checked(self.row1_invariant, 1)
         
         # Move zero tile to its correct position
         temp = 'lu'
@@ -417,44 +604,105 @@ class Puzzle:
            
         return mov
 
-    def solve_puzzle(self):
+    def iter_phases(self):
         """
-        Generate a solution string for a puzzle
-        Updates the puzzle and returns a move string
+        Solve the puzzle one tile at a time, labelling each step with
+        its phase: "lower_rows", "col0", "top_rows" or "2x2"
+        Updates the puzzle as it goes and yields (phase, move string)
         """
-        # Solution vars
-        temp = ''
-        mov = ''
-        
+        self._require_solvable()
+
         # Zero position and limits
         pos = self.current_position(0, 0)
         limit = (self.get_height() - 1, self.get_width() - 1)
         
         # Move the zero tile to the last position
         temp = 'd' * (limit[0] - pos[0]) + 'r' * (limit[1] - pos[1])
-        mov += temp
         self.update_puzzle(temp)
+        yield "lower_rows", temp
         
         # Solve all rows except top 2 rows
         for row in range(self.get_height() - 1, 1, -1):
             for col in range(self.get_width() - 1, 0, -1):
-                temp = self.solve_interior_tile(row, col)
-                mov += temp
-            temp = self.solve_col0_tile(row)
-            mov += temp
+                yield "lower_rows", self.solve_interior_tile(row, col)
+            yield "col0", self.solve_col0_tile(row)
         
         # Solve top 2 rows execpt for the last 2x2 square
         for col in range(self.get_width() - 1, 1, -1):
-            temp = self.solve_row1_tile(col) + self.solve_row0_tile(col)
-            mov += temp
+            yield "top_rows", self.solve_row1_tile(col)
+            yield "top_rows", self.solve_row0_tile(col)
             
         # Solve last 2x2 square
-        temp = self.solve_2x2()
-        mov += temp
-        
+        yield "2x2", self.solve_2x2()
+
+    def iter_solve(self):
+        """
+        Generate a solution for a puzzle lazily, so the first moves are
+        available before the rest of the board has been solved
+        Updates the puzzle as it goes and yields non-empty move strings
+        """
+        for _, temp in self.iter_phases():
+            if temp:
+                yield temp
+
+    def solve_puzzle(self):
+        """
+        Generate a solution string for a puzzle
+        Updates the puzzle and returns a move string
+        """
+        return ''.join(self.iter_solve())
+
+    def solve_large(self):
+        """
+        Generate the same solution string as solve_puzzle, applying
+        whole compiled macros instead of single moves (see large_board),
+        which is much faster on large boards
+        Updates the puzzle and returns a move string
+        """
+        self._require_solvable()
+        mov = large_board.solve(self._cells, self._index, self._height,
+                                self._width)
+        if self._row_solved is not None:
+            self._row_solved = None
+            self.set_verify("full")
+        return mov
+
+    def solve_optimal(self, heuristic=None, max_nodes=1000000, time_limit=None,
+                      workers=None):
+        """
+        Generate a shortest solution string for a puzzle using IDA*
+        With workers the search is split over that many processes
+        (see parallel_search) and only time_limit bounds it
+        Falls back to solve_puzzle if the node or time budget runs out
+        Updates the puzzle and returns a move string
+        """
+        self._require_solvable()
+        if workers is not None:
+            import parallel_search
+
+            mov = parallel_search.solve_parallel(
+                self._cells, self._height, self._width, workers, heuristic,
+                time_limit)
+        else:
+            mov = optimal.solve_optimal(self._cells, self._height,
+                                        self._width, heuristic, max_nodes,
+                                        time_limit)
+        if mov is None:
+            return self.solve_puzzle()
+        self.update_puzzle(mov)
         return mov
     
-# Start interactive simulation    
-poc_fifteen_gui.FifteenGUI(Puzzle(4, 4))
+
+def main():
+    """
+    Start interactive simulation
+    """
+    import poc_fifteen_gui
+
+    poc_fifteen_gui.FifteenGUI(Puzzle(4, 4))
+
+
+if __name__ == "__main__":
+    main()
 
 